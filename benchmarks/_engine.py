@@ -0,0 +1,19 @@
+import importlib.util
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def load_engine():
+    """Import epub-translator.py, whose file name is not a valid module name."""
+    if 'epub_translator' in sys.modules:
+        return sys.modules['epub_translator']
+    spec = importlib.util.spec_from_file_location(
+        'epub_translator', os.path.join(ROOT, 'epub-translator.py'))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['epub_translator'] = module
+    spec.loader.exec_module(module)
+    return module
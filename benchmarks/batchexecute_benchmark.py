@@ -0,0 +1,106 @@
+import argparse
+import glob
+import json
+import random
+import time
+
+import _engine  # noqa: F401  (puts the repository root on sys.path)
+from google_trans_new import BatchExecuteDecoder, google_translator
+
+WORDS = ('the', 'sword', 'sect', 'elder', 'qi', 'cultivation', 'young', 'master', 'said',
+         'heaven', 'realm', 'breakthrough', 'and', 'of', 'a', 'to', 'his', 'her', 'cười', 'đạo')
+
+
+def legacy_decode_rpcs(translator, body, count):
+    # The line scanner google_translator used before BatchExecuteDecoder.
+    translated = {}
+    for line in body.splitlines():
+        decoded_line = line.decode('utf-8')
+        if "MkEWBc" in decoded_line:
+            for envelope in json.loads(decoded_line):
+                if envelope[0] != "wrb.fr" or envelope[1] != "MkEWBc":
+                    continue
+                try:
+                    position = int(envelope[-1]) - 1
+                except (TypeError, ValueError):
+                    position = 0 if count == 1 else -1
+                response = json.loads(envelope[2])
+                sentences = response[1][0][0][5]
+                translate_text = ""
+                for sentence in sentences:
+                    sentence = sentence[0]
+                    if isinstance(sentence, str):
+                        translate_text += sentence.strip() + ' '
+                if 0 <= position < count:
+                    translated[position] = translate_text
+    return translated
+
+
+def make_response(rng, rpcs, sentences):
+    """A response body shaped like the ones translate.google.com sends back."""
+    frames = []
+    for rpc in range(1, rpcs + 1):
+        parts = []
+        for _ in range(sentences):
+            text = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(5, 25))).capitalize() + '. '
+            parts.append([text, text.lower(), None, None, 3, None, None, [[]], [[['x', 'y']]]])
+        payload = [[None, None, 'en', [[[0, [[[None, 12]], [True]]]], 12]],
+                   [[[None, None, None, None, None, parts]], 'vi', 1, 'en',
+                    [' '.join(part[1] for part in parts), 'en', 'vi', True]], 'en']
+        frames.append([['wrb.fr', 'MkEWBc', json.dumps(payload, ensure_ascii=False), None, None, None, str(rpc)]])
+    frames.append([['di', 38], ['af.httprm', 37, '-1953471098093046262', 20]])
+    frames.append([['e', 4, None, None, 1000]])
+    body = ")]}'\n\n"
+    for frame in frames:
+        frame = json.dumps(frame, ensure_ascii=False, separators=(',', ':'))
+        body += '%d\n%s\n' % (len(frame), frame)
+    return body.encode('utf-8')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Time decoding of batchexecute responses, line scanning against frame decoding.')
+    parser.add_argument('--responses', type=str, metavar='GLOB',
+                        help='recorded response bodies to decode instead of generated ones')
+    parser.add_argument('--count', type=int, default=500, help='generated responses (default: %(default)s)')
+    parser.add_argument('--rpcs', type=int, default=8, help='results per generated response (default: %(default)s)')
+    parser.add_argument('--sentences', type=int, default=20,
+                        help='sentences per generated result (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per method (default: %(default)s)')
+    args = parser.parse_args()
+
+    if args.responses:
+        bodies = []
+        for path in sorted(glob.glob(args.responses)):
+            with open(path, 'rb') as f:
+                bodies.append(f.read())
+    else:
+        rng = random.Random(21)
+        bodies = [make_response(rng, args.rpcs, args.sentences) for _ in range(args.count)]
+    if not bodies:
+        parser.error('no response to decode')
+    counts = [sum(1 for _ in BatchExecuteDecoder.iter_payloads(BatchExecuteDecoder.iter_envelopes([body])))
+              for body in bodies]
+    print(f'{len(bodies)} responses, {sum(map(len, bodies)) / 2**20:.1f} MB, {sum(counts)} results')
+
+    translator = google_translator()
+    methods = [
+        ('line scan', lambda body, count: legacy_decode_rpcs(translator, body, count)),
+        ('frames', lambda body, count: translator._decode_rpcs(
+            BatchExecuteDecoder.iter_envelopes([body[i:i + 8192] for i in range(0, len(body), 8192)]), count)),
+    ]
+    results = {}
+    for name, method in methods:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            results[name] = [method(body, count) for body, count in zip(bodies, counts)]
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        print(f'{name:<10} best {best * 1000:8.1f} ms   {len(bodies) / best:9.0f} responses/s')
+    if results['line scan'] != results['frames']:
+        print('Warning: the two decoders returned different results')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+import argparse
+import random
+import string
+import time
+
+import _engine  # noqa: F401  (puts the repository root on sys.path)
+from dictionary_matcher import DictionaryMatcher
+
+
+def loop_replace(translation_dict, text):
+    # The per-key `in` + str.replace loop the engine used before DictionaryMatcher.
+    for replace_text in translation_dict.keys():
+        if replace_text in text:
+            text = text.replace(replace_text, translation_dict[replace_text])
+    return text
+
+
+def random_word(rng, min_len=3, max_len=10):
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(min_len, max_len)))
+
+
+def make_dictionary(rng, size):
+    translation_dict = {}
+    while len(translation_dict) < size:
+        key = ' '.join(random_word(rng) for _ in range(rng.randint(1, 3))).capitalize()
+        translation_dict[key] = random_word(rng).upper()
+    return translation_dict
+
+
+def make_segments(rng, translation_dict, count, length):
+    keys = list(translation_dict)
+    segments = []
+    for _ in range(count):
+        words = []
+        while sum(len(word) + 1 for word in words) < length:
+            words.append(rng.choice(keys) if rng.random() < 0.05 else random_word(rng))
+        segments.append(' '.join(words))
+    return segments
+
+
+def timed(func, translation_dict, segments):
+    start = time.perf_counter()
+    for segment in segments:
+        func(translation_dict, segment)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compare the translation dictionary matcher against the per-key replace loop.')
+    parser.add_argument('--sizes', type=str, default='100,1000,5000,20000',
+                        help='comma separated dictionary sizes (default: %(default)s)')
+    parser.add_argument('--segments', type=int, default=2000,
+                        help='number of translated segments (default: %(default)s)')
+    parser.add_argument('--length', type=int, default=300,
+                        help='characters per segment (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f'{"keys":>8} {"build (s)":>10} {"matcher (s)":>12} {"loop (s)":>10} {"speedup":>8}')
+    for size in [int(size) for size in args.sizes.split(',')]:
+        translation_dict = make_dictionary(rng, size)
+        segments = make_segments(rng, translation_dict, args.segments, args.length)
+
+        start = time.perf_counter()
+        matcher = DictionaryMatcher(translation_dict)
+        build_time = time.perf_counter() - start
+
+        matcher_time = timed(lambda _, text: matcher.replace(text), translation_dict, segments)
+        loop_time = timed(loop_replace, translation_dict, segments)
+        print(f'{size:>8} {build_time:>10.3f} {matcher_time:>12.3f} {loop_time:>10.3f} '
+              f'{loop_time / matcher_time:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+import _engine
+
+CHAPTER = ('<?xml version="1.0" encoding="utf-8"?>\n<html xmlns="http://www.w3.org/1999/xhtml">'
+           '<head><title>Page {0}</title></head><body><p><img src="../Images/{0:04d}.jpg"/></p>'
+           '<p>Caption of page {0}.</p></body></html>')
+
+
+def make_epub(path, images, image_size, chapters):
+    """Write an illustrated epub: mostly incompressible images, a little HTML."""
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('mimetype', 'application/epub+zip', compress_type=zipfile.ZIP_STORED)
+        archive.writestr('META-INF/container.xml', '<?xml version="1.0"?><container/>',
+                         compress_type=zipfile.ZIP_DEFLATED)
+        for index in range(images):
+            archive.writestr(f'OEBPS/Images/{index:04d}.jpg', os.urandom(image_size),
+                             compress_type=zipfile.ZIP_DEFLATED)
+        for index in range(chapters):
+            archive.writestr(f'OEBPS/Text/{index:04d}.xhtml', CHAPTER.format(index),
+                             compress_type=zipfile.ZIP_DEFLATED)
+
+
+def recompress(epub_path, output_path, work_dir):
+    # The previous zip_epub: extract everything, then deflate every file again.
+    extracted = Path(work_dir) / 'extracted'
+    with zipfile.ZipFile(epub_path) as source:
+        source.extractall(extracted)
+    with zipfile.ZipFile(output_path, 'w') as archive:
+        archive.write(str(extracted / 'mimetype'), 'mimetype', compress_type=zipfile.ZIP_STORED)
+        for file in extracted.rglob('*.*'):
+            archive.write(str(file), str(file.relative_to(extracted)),
+                          compress_type=zipfile.ZIP_DEFLATED)
+    shutil.rmtree(extracted)
+
+
+def raw_copy(engine, epub_path, output_path, work_dir):
+    # Default mode: extract, then copy untouched members verbatim.
+    engine.in_memory = False
+    engine.file_path = epub_path
+    engine.file_extracted_path = os.path.join(work_dir, 'extracted')
+    with zipfile.ZipFile(epub_path) as source:
+        source.extractall(engine.file_extracted_path)
+        engine.write_epub(source, output_path)
+    shutil.rmtree(engine.file_extracted_path)
+
+
+def in_memory(engine, epub_path, output_path, work_dir):
+    engine.in_memory = True
+    with zipfile.ZipFile(epub_path) as source:
+        engine.translated_members = {
+            info.filename: source.read(info) for info in source.infolist()
+            if info.filename.lower().endswith(_engine.load_engine().HTML_EXTENSIONS)}
+        engine.write_epub(source, output_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Time packaging of an image-heavy epub with and without raw member copies.')
+    parser.add_argument('--images', type=int, default=200, help='number of images (default: %(default)s)')
+    parser.add_argument('--image-size', type=int, default=200, metavar='KB',
+                        help='size of each image in KB (default: %(default)s)')
+    parser.add_argument('--chapters', type=int, default=50, help='number of HTML files (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per method (default: %(default)s)')
+    args = parser.parse_args()
+
+    module = _engine.load_engine()
+    engine = module.TranslatorEngine()
+    with tempfile.TemporaryDirectory() as work_dir:
+        epub_path = os.path.join(work_dir, 'illustrated.epub')
+        make_epub(epub_path, args.images, args.image_size * 1024, args.chapters)
+        print(f'Source epub: {os.path.getsize(epub_path) / 2**20:.1f} MB, '
+              f'{args.images} images, {args.chapters} HTML files')
+        methods = [
+            ('extract + recompress all', lambda out: recompress(epub_path, out, work_dir)),
+            ('extract + raw copy', lambda out: raw_copy(engine, epub_path, out, work_dir)),
+            ('in-memory + raw copy', lambda out: in_memory(engine, epub_path, out, work_dir)),
+        ]
+        for name, method in methods:
+            output_path = os.path.join(work_dir, 'output.epub')
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                method(output_path)
+                timings.append(time.perf_counter() - start)
+            with zipfile.ZipFile(output_path) as output:
+                assert output.testzip() is None
+            print(f'{name:<26} best {min(timings):7.3f} s   output {os.path.getsize(output_path) / 2**20:.1f} MB')
+            os.remove(output_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+import argparse
+import io
+import random
+import time
+import zipfile
+
+import _engine
+
+HEADER = ('<?xml version="1.0" encoding="utf-8"?>\n<!DOCTYPE html>\n'
+          '<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">'
+          '<head><title>Chapter {0}</title><link href="../Styles/style.css" rel="stylesheet" '
+          'type="text/css"/></head>\n<body>\n<h1 class="chapter">Chapter {0}</h1>\n')
+WORDS = ('the', 'sword', 'sect', 'elder', 'qi', 'cultivation', 'young', 'master', 'said',
+         'heaven', 'realm', 'breakthrough', 'and', 'of', 'a', 'to', 'his', 'her')
+
+
+def make_chapter(rng, index, paragraphs):
+    """A web novel chapter: many short paragraphs, a little inline markup."""
+    pieces = [HEADER.format(index)]
+    for _ in range(paragraphs):
+        sentence = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(8, 40))).capitalize()
+        if rng.random() < 0.2:
+            pieces.append('<p>%s <i>&#8220;%s&#8221;</i> &amp; more.</p>\n' % (sentence, rng.choice(WORDS)))
+        else:
+            pieces.append('<p class="txt">%s.</p>\n' % sentence)
+    pieces.append('<p>* * *</p>\n<!-- end of chapter -->\n</body></html>')
+    return ''.join(pieces).encode('utf-8')
+
+
+def make_epub(chapters, paragraphs):
+    rng = random.Random(18)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for index in range(chapters):
+            archive.writestr(f'OEBPS/Text/{index:04d}.xhtml', make_chapter(rng, index, paragraphs))
+    return buffer
+
+
+def parse_and_write(engine, names):
+    engine.translated_members = {}
+    parse_time = write_time = 0.0
+    for name in names:
+        start = time.perf_counter()
+        soup, epub_eles, text_list = engine.parse_html(name)
+        middle = time.perf_counter()
+        engine.write_html(name, soup, epub_eles, [text.upper() for text in text_list])
+        write_time += time.perf_counter() - middle
+        parse_time += middle - start
+    return parse_time, write_time, engine.translated_members
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Time HTML parsing and serialization with BeautifulSoup and with lxml.')
+    parser.add_argument('--chapters', type=int, default=300, help='number of HTML files (default: %(default)s)')
+    parser.add_argument('--paragraphs', type=int, default=80,
+                        help='paragraphs per chapter (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per method (default: %(default)s)')
+    args = parser.parse_args()
+
+    module = _engine.load_engine()
+    engine = module.TranslatorEngine()
+    engine.in_memory = True
+    engine.epub_zip = zipfile.ZipFile(make_epub(args.chapters, args.paragraphs))
+    names = engine.epub_zip.namelist()
+    size = sum(info.file_size for info in engine.epub_zip.infolist())
+    print(f'{args.chapters} chapters, {size / 2**20:.1f} MB of HTML')
+
+    results = {}
+    for name, fast_html in (('BeautifulSoup', False), ('lxml', True)):
+        engine.fast_html = fast_html
+        timings = [parse_and_write(engine, names) for _ in range(args.repeat)]
+        parse_time = min(timing[0] for timing in timings)
+        write_time = min(timing[1] for timing in timings)
+        results[name] = timings[-1][2]
+        print(f'{name:<14} parse {parse_time:7.3f} s   write {write_time:7.3f} s   '
+              f'total {parse_time + write_time:7.3f} s')
+    assert results['BeautifulSoup'] == results['lxml'], 'the two paths wrote different HTML'
+    print('Output identical')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import _engine  # noqa: F401  (puts the repository root on sys.path)
+from google_trans_new import RPC_PATH, XSSI_PREFIX
+
+# Pseudo-translation: accented vowels keep the text readable and leave the
+# segment markers of the engine, which have no letters, untouched.
+PSEUDO_TABLE = str.maketrans('aeiouyAEIOUY', 'áéíóúýÁÉÍÓÚÝ')
+
+
+def pseudo_translate(text):
+    return text.translate(PSEUDO_TABLE)
+
+
+def make_payload(text, lang_src, lang_tgt):
+    translated = pseudo_translate(text)
+    lang_src = 'en' if lang_src == 'auto' else lang_src
+    return [[None, None, lang_src],
+            [[[None, None, None, None, None, [[translated, text]]]], lang_tgt, 1, lang_src]]
+
+
+def make_body(rpcs):
+    """A response framed like the real batchexecute endpoint answers."""
+    frames = []
+    for rpc_id, parameter, _, rpc_tag in rpcs:
+        (text, lang_src, lang_tgt, _), _ = json.loads(parameter)
+        payload = json.dumps(make_payload(text, lang_src, lang_tgt), ensure_ascii=False)
+        frames.append([['wrb.fr', rpc_id, payload, None, None, None, rpc_tag]])
+    frames.append([['di', 31], ['af.httprm', 30, '-6211584375934187702', 22]])
+    frames.append([['e', 4, None, None, 100]])
+    body = XSSI_PREFIX + '\n\n'
+    for frame in frames:
+        frame = json.dumps(frame, ensure_ascii=False, separators=(',', ':'))
+        body += '%d\n%s\n' % (len(frame), frame)
+    return body.encode('utf-8')
+
+
+class MockTranslateHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8')
+        if self.path.split('?', 1)[0] != RPC_PATH:
+            return self.reply(404, b'')
+        try:
+            rpcs = json.loads(parse_qs(body)['f.req'][0])[0]
+        except (KeyError, IndexError, ValueError):
+            return self.reply(400, b'')
+        server.count('requests')
+        server.count('rpcs', len(rpcs))
+        time.sleep(server.delay(sum(len(json.loads(rpc[1])[0][0]) for rpc in rpcs)))
+        fault = server.fault()
+        if fault == 'throttled':
+            return self.reply(429, b'')
+        if fault == 'error':
+            return self.reply(500, b'')
+        if fault == 'empty':
+            # What Google serves throttled clients instead of a 429.
+            return self.reply(200, b'')
+        self.reply(200, make_body(rpcs))
+
+    def reply(self, status, data):
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up, e.g. the slower copy of a hedged request.
+            self.server.count('abandoned')
+            self.close_connection = True
+
+
+class MockServer(ThreadingHTTPServer):
+    """A local HTTP server run in a background thread, counting what it does."""
+
+    daemon_threads = True
+    COUNTERS = ()
+
+    def __init__(self, port, handler):
+        super().__init__(('127.0.0.1', port), handler)
+        self.lock = threading.Lock()
+        self.thread = None
+        self.counters = {}
+        self.reset()
+
+    @property
+    def url_base(self):
+        return 'http://127.0.0.1:%d' % self.server_address[1]
+
+    def reset(self):
+        with self.lock:
+            self.counters = dict.fromkeys(self.COUNTERS, 0)
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class MockTranslateServer(MockServer):
+    """Local stand-in for the Google Translate batchexecute endpoint.
+
+    Every request waits `latency` seconds plus up to `jitter` more, and
+    `char_latency` seconds per 1000 characters of text; a `stall_rate` share
+    of them waits `stall` seconds instead. Faults are injected at random:
+    429 responses (`throttle_rate`), 500 responses (`error_rate`) and empty
+    pages (`empty_rate`). Texts come back pseudo-translated.
+    """
+
+    COUNTERS = ('requests', 'rpcs', 'throttled', 'error', 'empty', 'abandoned')
+
+    def __init__(self, port=0, latency=0.0, jitter=0.0, stall_rate=0.0, stall=0.0,
+                 throttle_rate=0.0, error_rate=0.0, empty_rate=0.0, seed=None, char_latency=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.char_latency = char_latency
+        self.stall_rate = stall_rate
+        self.stall = stall
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.empty_rate = empty_rate
+        self.random = random.Random(seed)
+        super().__init__(port, MockTranslateHandler)
+
+    def delay(self, chars=0):
+        with self.lock:
+            if self.stall_rate and self.random.random() < self.stall_rate:
+                return self.stall
+            return self.latency + self.random.uniform(0, self.jitter) + self.char_latency * chars / 1000
+
+    def fault(self):
+        with self.lock:
+            draw = self.random.random()
+            for name, rate in (('throttled', self.throttle_rate), ('error', self.error_rate),
+                               ('empty', self.empty_rate)):
+                if draw < rate:
+                    self.counters[name] += 1
+                    return name
+                draw -= rate
+        return None
+
+
+# Headers that only concern one hop, which a proxy does not pass on.
+HOP_BY_HOP_HEADERS = {'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+                      'proxy-connection', 'te', 'trailers', 'transfer-encoding', 'upgrade'}
+
+
+class MockProxyHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # The headers and body of an answer are written separately; without this
+    # the body waits for the delayed ACK of a kept-alive client.
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        self.server.count('connections')
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        target = urlsplit(self.path)
+        if target.scheme != 'http' or not target.hostname:
+            # Only plain HTTP is forwarded, which is what the mock endpoint speaks.
+            return self.reply(501, b'')
+        self.server.count('requests')
+        headers = {name: value for name, value in self.headers.items()
+                   if name.lower() not in HOP_BY_HOP_HEADERS}
+        path = target.path + ('?' + target.query if target.query else '')
+        connection = http.client.HTTPConnection(target.hostname, target.port or 80,
+                                                timeout=self.server.upstream_timeout)
+        try:
+            connection.request(self.command, path, body, headers)
+            response = connection.getresponse()
+            status, data = response.status, response.read()
+            content_type = response.getheader('Content-Type', 'application/octet-stream')
+        except OSError:
+            self.server.count('errors')
+            return self.reply(502, b'')
+        finally:
+            connection.close()
+        self.reply(status, data, content_type)
+
+    do_GET = do_POST
+
+    def reply(self, status, data, content_type='text/plain'):
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+
+class MockProxyServer(MockServer):
+    """Local stand-in for an HTTP forward proxy.
+
+    Requests sent with an absolute URL are passed on to their target, one
+    upstream connection each, and the answer is relayed back; clients keep
+    their connection to the proxy alive. Counts the client connections, the
+    requests forwarded and the ones whose target could not be reached.
+    """
+
+    COUNTERS = ('connections', 'requests', 'errors')
+
+    def __init__(self, port=0, upstream_timeout=10.0):
+        self.upstream_timeout = upstream_timeout
+        super().__init__(port, MockProxyHandler)
+
+
+def add_server_arguments(parser):
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds per request (default: %(default)s)')
+    parser.add_argument('--jitter', type=float, default=0.02,
+                        help='random extra seconds per request (default: %(default)s)')
+    parser.add_argument('--char-latency', type=float, default=0.0,
+                        help='extra seconds per 1000 characters of text (default: %(default)s)')
+    parser.add_argument('--stall-rate', type=float, default=0.0,
+                        help='share of requests that stall (default: %(default)s)')
+    parser.add_argument('--stall', type=float, default=2.0, help='seconds a stalled request takes (default: %(default)s)')
+    parser.add_argument('--throttle-rate', type=float, default=0.0,
+                        help='share of requests answered with 429 (default: %(default)s)')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='share of requests answered with 500 (default: %(default)s)')
+    parser.add_argument('--empty-rate', type=float, default=0.0,
+                        help='share of requests answered with an empty page (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=22, help='random seed (default: %(default)s)')
+
+
+def make_server(args, port=0):
+    return MockTranslateServer(port, args.latency, args.jitter, args.stall_rate, args.stall,
+                               args.throttle_rate, args.error_rate, args.empty_rate, args.seed, args.char_latency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a local stand-in for the Google Translate endpoint.')
+    parser.add_argument('--port', type=int, default=8765, help='port to listen on (default: %(default)s)')
+    add_server_arguments(parser)
+    args = parser.parse_args()
+    server = make_server(args, args.port)
+    print(f'Serving {server.url_base}{RPC_PATH}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(server.stats())
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+import _engine
+from html_parse_benchmark import make_chapter
+from mock_server import add_server_arguments, make_server
+
+CONTAINER = ('<?xml version="1.0"?><container version="1.0" '
+             'xmlns="urn:oasis:names:tc:opendocument:xmlns:container"><rootfiles>'
+             '<rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>'
+             '</rootfiles></container>')
+
+
+def make_epub(path, chapters, paragraphs):
+    rng = random.Random(chapters)
+    items = ''.join(f'<item id="c{index}" href="Text/{index:04d}.xhtml" media-type="application/xhtml+xml"/>'
+                    for index in range(chapters))
+    spine = ''.join(f'<itemref idref="c{index}"/>' for index in range(chapters))
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('mimetype', 'application/epub+zip', compress_type=zipfile.ZIP_STORED)
+        archive.writestr('META-INF/container.xml', CONTAINER, compress_type=zipfile.ZIP_DEFLATED)
+        archive.writestr('OEBPS/content.opf',
+                         f'<?xml version="1.0"?><package version="3.0"><manifest>{items}</manifest>'
+                         f'<spine>{spine}</spine></package>', compress_type=zipfile.ZIP_DEFLATED)
+        for index in range(chapters):
+            archive.writestr(f'OEBPS/Text/{index:04d}.xhtml', make_chapter(rng, index, paragraphs),
+                             compress_type=zipfile.ZIP_DEFLATED)
+
+
+def peak_rss():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS.
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def run_book(config):
+    """Translate one book in this (fresh) process and write the measurements."""
+    module = _engine.load_engine()
+    from google_trans_new import EndpointPool, HedgePolicy, get_default_chunk_sizer, get_default_limiter
+
+    class RecordingEndpointPool(EndpointPool):
+        def __init__(self, url_base):
+            super().__init__(url_bases=[url_base])
+            self.latencies = []
+
+        def release(self, endpoint, latency, ok):
+            if ok is not None:
+                self.latencies.append(latency)
+            super().release(endpoint, latency, ok)
+
+    if config['rate']:
+        limiter = get_default_limiter()
+        limiter.rate = limiter.max_rate = config['rate']
+        limiter.burst = max(limiter.burst, config['concurrency'])
+    if config['target_latency']:
+        get_default_chunk_sizer().target_latency = config['target_latency']
+    engine = module.TranslatorEngine()
+    if config['fixed_chunks']:
+        engine.chunk_sizer = None
+    engine.resume = False
+    engine.backend = config['backend']
+    engine.concurrency = config['concurrency']
+    engine.in_memory = config['in_memory']
+    engine.workers = config['workers']
+    engine.endpoints = RecordingEndpointPool(config['url_base'])
+    if config['hedge'] is not None:
+        engine.hedge = HedgePolicy(budget=config['hedge'])
+    engine.reset_translator()
+    start = time.perf_counter()
+    completed = engine.start(config['epub'])
+    seconds = time.perf_counter() - start
+    engine.shutdown_workers()
+    with open(config['result'], 'w') as f:
+        json.dump({'completed': completed, 'seconds': seconds, 'latencies': engine.endpoints.latencies,
+                   'peak_rss': peak_rss(), 'chunk_sizes': get_default_chunk_sizer().stats()['chosen'],
+                   'hedging': engine.hedge.stats() if engine.hedge is not None else None,
+                   **engine.dedup_stats}, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Translate synthetic epub files end to end against a local mock server.')
+    parser.add_argument('--chapters', type=str, default='20,100,300',
+                        help='comma separated book sizes in chapters (default: %(default)s)')
+    parser.add_argument('--paragraphs', type=int, default=40, help='paragraphs per chapter (default: %(default)s)')
+    parser.add_argument('-b', '--backend', type=str, choices=['threads', 'asyncio'], default='threads')
+    parser.add_argument('-c', '--concurrency', type=int, default=8)
+    parser.add_argument('-w', '--workers', type=int, default=0)
+    parser.add_argument('--in-memory', action='store_true')
+    parser.add_argument('--rate', type=float,
+                        help='fixed client request rate per second (default: the adaptive client limiter)')
+    parser.add_argument('--fixed-chunks', action='store_true',
+                        help='pack fixed 5000 character chunks instead of adapting their size to the latency')
+    parser.add_argument('--target-latency', type=float,
+                        help='request latency the chunk size adapts to (default: the client default)')
+    parser.add_argument('--hedge', type=float, metavar='budget', nargs='?', const=0.1,
+                        help='hedge slow requests, with at most budget hedges per request')
+    parser.add_argument('--json', type=str, metavar='path', help='also write the results to this file')
+    parser.add_argument('--child', type=str, help=argparse.SUPPRESS)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    if args.child:
+        with open(args.child) as f:
+            run_book(json.load(f))
+        return
+
+    server = make_server(args).start()
+    results = []
+    print(f'{"chapters":>8} {"segments":>9} {"seconds":>8} {"seg/s":>8} {"requests":>9} {"req/s":>7} '
+          f'{"p50 ms":>7} {"p99 ms":>7} {"chunk":>6} {"peak RSS":>9}')
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            for chapters in [int(size) for size in args.chapters.split(',')]:
+                epub = os.path.join(work_dir, f'book{chapters}.epub')
+                make_epub(epub, chapters, args.paragraphs)
+                config_path = os.path.join(work_dir, 'config.json')
+                result_path = os.path.join(work_dir, 'result.json')
+                with open(config_path, 'w') as f:
+                    json.dump({'epub': epub, 'result': result_path, 'url_base': server.url_base,
+                               'backend': args.backend, 'concurrency': args.concurrency,
+                               'workers': args.workers, 'in_memory': args.in_memory, 'rate': args.rate,
+                               'fixed_chunks': args.fixed_chunks, 'target_latency': args.target_latency,
+                               'hedge': args.hedge}, f)
+                server.reset()
+                subprocess.run([sys.executable, os.path.abspath(__file__), '--child', config_path],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+                with open(result_path) as f:
+                    result = json.load(f)
+                latencies = result.pop('latencies')
+                result.update(chapters=chapters, server=server.stats(),
+                              p50=percentile(latencies, 0.5), p99=percentile(latencies, 0.99))
+                results.append(result)
+                requests = result['server']['requests']
+                rss = f'{result["peak_rss"] / 2**20:.0f} MB' if result['peak_rss'] else '-'
+                p50 = f'{result["p50"] * 1000:.0f}' if result['p50'] is not None else '-'
+                p99 = f'{result["p99"] * 1000:.0f}' if result['p99'] is not None else '-'
+                chunk = f'{result["chunk_sizes"]["mean"]:.0f}' if result['chunk_sizes']['mean'] else '-'
+                status = '' if result['completed'] else '  (failed)'
+                print(f'{chapters:>8} {result["segments"]:>9} {result["seconds"]:>8.2f} '
+                      f'{result["segments"] / result["seconds"]:>8.0f} {requests:>9} '
+                      f'{requests / result["seconds"]:>7.1f} {p50:>7} {p99:>7} {chunk:>6} {rss:>9}{status}')
+                if result['hedging']:
+                    print(f'{"":>8} hedged {result["hedging"]["hedged"]} requests, '
+                          f'{result["hedging"]["hedge_wins"]} won by the hedge')
+    finally:
+        server.stop()
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
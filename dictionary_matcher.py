@@ -0,0 +1,97 @@
+import re
+from collections import deque
+
+
+class DictionaryMatcher():
+    """Aho-Corasick automaton over the keys of a translation dictionary.
+
+    `replace` rewrites a text in a single left-to-right pass. When keys
+    overlap, the match that starts first wins, and among matches starting at
+    the same position the longest one wins. Replaced text is never scanned
+    again, so the result does not depend on the order of the dictionary.
+    """
+
+    def __init__(self, translation_dict):
+        self.goto = [{}]
+        self.fail = [0]
+        self.depth = [0]
+        self.output = [None]
+        for key, value in translation_dict.items():
+            if key:
+                self._add(key, value)
+        self._build()
+        # Jumps over text that cannot start any key while the automaton is idle.
+        self.first_chars = re.compile(
+            '[%s]' % ''.join(re.escape(char) for char in self.goto[0])) if self.goto[0] else None
+
+    def _add(self, key, value):
+        state = 0
+        for char in key:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto.append({})
+                self.fail.append(0)
+                self.depth.append(self.depth[state] + 1)
+                self.output.append(None)
+                self.goto[state][char] = next_state
+            state = next_state
+        self.output[state] = (len(key), value)
+
+    def _build(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fail = self.fail[state]
+                while fail and char not in self.goto[fail]:
+                    fail = self.fail[fail]
+                fail = self.goto[fail].get(char, 0)
+                self.fail[next_state] = fail if fail != next_state else 0
+                # Keep the longest key that ends in this state.
+                if self.output[next_state] is None:
+                    self.output[next_state] = self.output[self.fail[next_state]]
+
+    def replace(self, text):
+        goto, fail, depth, output = self.goto, self.fail, self.depth, self.output
+        pieces = []
+        last = 0
+        best_start = best_end = -1
+        best_value = None
+        state = 0
+        i = 0
+        length = len(text)
+        if self.first_chars is None:
+            return text
+        while i < length or best_end >= 0:
+            if state == 0 and best_end < 0:
+                skip = self.first_chars.search(text, i)
+                if skip is None:
+                    break
+                i = skip.start()
+            if i < length:
+                char = text[i]
+                while state and char not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(char, 0)
+                found = output[state]
+                if found is not None:
+                    start = i - found[0] + 1
+                    if best_end < 0 or start < best_start or (start == best_start and i + 1 > best_end):
+                        best_start, best_end, best_value = start, i + 1, found[1]
+            # Once the current state no longer reaches back to best_start (or
+            # the text is exhausted), no later match can start at or before
+            # it, so the best match is final. Scanning resumes after it.
+            if best_end >= 0 and (i >= length or depth[state] < i - best_start + 1):
+                pieces.append(text[last:best_start])
+                pieces.append(best_value)
+                last = i = best_end
+                best_start = best_end = -1
+                state = 0
+                continue
+            i += 1
+        if not pieces:
+            return text
+        pieces.append(text[last:])
+        return ''.join(pieces)
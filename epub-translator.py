@@ -1,20 +1,38 @@
 import argparse
+import asyncio
+import copy
+import hashlib
+import json
+import multiprocessing
 import os
 import re
 import shutil
+import struct
 import sys
+import threading
+import time
 import zipfile
-from multiprocessing.dummy import Pool as ThreadPool
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from itertools import repeat
 from pathlib import Path
 
 import requests
 import tqdm
-from bs4 import BeautifulSoup as bs
-from bs4 import element
-from google_trans_new import google_translator
+from dictionary_matcher import DictionaryMatcher
+from google_trans_new import (BATCH_MAX_CHARS, BATCH_MAX_RPCS, HEDGE_BUDGET, MAX_CHUNK_CHARS, URLS_SUFFIX,
+                              EndpointPool, HedgePolicy, ProxyPool, async_google_translator,
+                              get_default_chunk_sizer, get_default_latency, get_default_limiter,
+                              get_default_pool, google_new_transError, google_translator, group_batches)
+from html_worker import init_worker, parse_html, parse_task, render_html, render_task
+from run_stats import StageTimers, write_report
+from text_split import split_text
+from translation_cache import DEFAULT_CACHE_SIZE, TranslationMemory
+from translation_journal import TranslationJournal
 
 tool_version = '1.0.2'
 LINE_SIZE = 90
+UPDATE_CHECK_INTERVAL = 24 * 60 * 60
 HEADERS = {
     'user-agent': ('Mozilla/5.0 (Macintosh; Intel Mac OS X 10_9_3) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/35.0.1916.47 Safari/537.36')}
 
@@ -143,22 +161,270 @@ class pcolors:
     UNDERLINE = '\033[4m'
 
 
-def check_for_tool_updates():
+def get_update_cache_path():
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'epub-translator', 'update_check.json')
+
+
+class UpdateChecker():
+    """Tells the user about a newer release without slowing down startup.
+
+    The latest release is read from a small cache file. When the cache is
+    older than a day it is refreshed from GitHub on a daemon thread, so the
+    translation never waits for the network; a result that arrives during
+    the run is shown at the end of it.
+    """
+
+    def __init__(self, cache_path=None):
+        self.cache_path = cache_path or get_update_cache_path()
+        self.latest_release = None
+        self.thread = None
+        self.notified = False
+
+    def start(self):
+        try:
+            with open(self.cache_path, encoding='utf-8') as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            cached = {}
+        self.latest_release = cached.get('latest_release')
+        self.notify()
+        if time.time() - cached.get('checked', 0) < UPDATE_CHECK_INTERVAL:
+            return
+        self.thread = threading.Thread(target=self.fetch, daemon=True)
+        self.thread.start()
+
+    def fetch(self):
+        try:
+            release_api = 'https://api.github.com/repos/quantrancse/epub-translator/releases/latest'
+            response = requests.get(
+                release_api, headers=HEADERS, timeout=5).json()
+            self.latest_release = response['tag_name'][1:]
+        except Exception:
+            # Offline machines record the attempt too, so they do not retry on every launch.
+            pass
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            temp_path = self.cache_path + '.part'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({'checked': time.time(), 'latest_release': self.latest_release}, f)
+            os.replace(temp_path, self.cache_path)
+        except OSError:
+            pass
+
+    def finish(self):
+        if self.thread is not None and not self.thread.is_alive():
+            self.notify()
+
+    def notify(self):
+        if self.notified or not self.latest_release or self.latest_release == tool_version:
+            return
+        self.notified = True
+        print(
+            f'Current tool version: {pcolors.FAIL}{tool_version}{pcolors.ENDC}')
+        print(
+            f'Latest tool version: {pcolors.GREEN}{self.latest_release}{pcolors.ENDC}')
+        print(
+            f'Please upgrade the tool at: {pcolors.CYAN}https://github.com/quantrancse/epub-translator/releases{pcolors.ENDC}')
+        print('-' * LINE_SIZE)
+
+
+HTML_EXTENSIONS = ('.html', '.xhtml', '.htm')
+SEGMENT_MARKER = '\n[#{}#]\n'
+SEGMENT_MARKER_RE = re.compile(r'\s*\[\s*#\s*(\d+)\s*#\s*\]\s*')
+
+
+TRANSLATED_SUFFIX = '_translated'
+TRANSLATED_NAME_RE = re.compile(
+    re.escape(TRANSLATED_SUFFIX) + '(?:_(?:%s))?$' % '|'.join(map(re.escape, LANGUAGES)))
+
+
+def translated_name(file_name, dest_lang=None):
+    """Name of the folder and epub file written for the book `file_name`.
+    Editions of a multi-language run add their language."""
+    return file_name + TRANSLATED_SUFFIX + (f'_{dest_lang}' if dest_lang else '')
+
+
+def find_epub_files(folder):
+    """Epub files under `folder`, leaving out the ones this tool wrote."""
+    return sorted(str(p) for p in Path(folder).rglob('*.epub')
+                  if p.is_file() and TRANSLATED_NAME_RE.search(p.stem) is None)
+
+
+# Raw copies go through zipfile internals; without them members are re-encoded.
+RAW_ZIP_COPY = (all(hasattr(zipfile, name) for name in
+                    ('structFileHeader', 'sizeFileHeader', '_FH_FILENAME_LENGTH', '_FH_EXTRA_FIELD_LENGTH'))
+                and hasattr(zipfile.ZipFile, '_writecheck') and hasattr(zipfile.ZipInfo, 'FileHeader'))
+
+
+def can_copy_raw(source, archive):
+    return (RAW_ZIP_COPY and all(hasattr(source, name) for name in ('_lock', 'fp'))
+            and all(hasattr(archive, name) for name in ('fp', 'filelist', 'NameToInfo', 'start_dir', '_didModify')))
+
+
+def read_zip_member_raw(source, info):
+    """Compressed bytes of a member of `source`, read past its local header."""
+    with source._lock:
+        source.fp.seek(info.header_offset)
+        header = struct.unpack(zipfile.structFileHeader,
+                               source.fp.read(zipfile.sizeFileHeader))
+        source.fp.seek(header[zipfile._FH_FILENAME_LENGTH]
+                       + header[zipfile._FH_EXTRA_FIELD_LENGTH], os.SEEK_CUR)
+        return source.fp.read(info.compress_size)
+
+
+def copy_zip_member(source, archive, info):
+    """Copy a member of `source` into `archive` without decompressing it.
+
+    The compressed bytes are written verbatim with the original compression
+    method. Encrypted and ZIP64 members are re-encoded the regular way, and
+    so is everything when this Python's zipfile lacks the internals used.
+    """
+    if (not can_copy_raw(source, archive) or info.flag_bits & 0x01
+            or info.file_size >= zipfile.ZIP64_LIMIT
+            or info.compress_size >= zipfile.ZIP64_LIMIT
+            or info.header_offset >= zipfile.ZIP64_LIMIT):
+        archive.writestr(copy_zip_info(info), source.read(info))
+        return
     try:
-        release_api = 'https://api.github.com/repos/quantrancse/epub-translator/releases/latest'
-        response = requests.get(
-            release_api, headers=HEADERS, timeout=5).json()
-        latest_release = response['tag_name'][1:]
-        if tool_version != latest_release:
-            print(
-                f'Current tool version: {pcolors.FAIL}{tool_version}{pcolors.ENDC}')
-            print(
-                f'Latest tool version: {pcolors.GREEN}{latest_release}{pcolors.ENDC}')
-            print(
-                f'Please upgrade the tool at: {pcolors.CYAN}https://github.com/quantrancse/epub-translator/releases{pcolors.ENDC}')
-            print('-' * LINE_SIZE)
-    except Exception:
-        print('Something was wrong. Can not get the tool latest update!')
+        data = read_zip_member_raw(source, info)
+        zinfo = copy.copy(info)
+        # CRC and sizes are known up front, so no trailing data descriptor.
+        zinfo.flag_bits &= ~0x08
+        archive._writecheck(zinfo)
+        header = zinfo.FileHeader()
+    except (AttributeError, TypeError, struct.error):
+        # Nothing is written to `archive` before this point.
+        archive.writestr(copy_zip_info(info), source.read(info))
+        return
+    zinfo.header_offset = archive.fp.tell()
+    archive.fp.write(header)
+    archive.fp.write(data)
+    archive.filelist.append(zinfo)
+    archive.NameToInfo[zinfo.filename] = zinfo
+    archive.start_dir = archive.fp.tell()
+    archive._didModify = True
+
+
+def copy_zip_info(info):
+    zinfo = zipfile.ZipInfo(info.filename, info.date_time)
+    zinfo.compress_type = info.compress_type
+    zinfo.external_attr = info.external_attr
+    zinfo.create_system = info.create_system
+    return zinfo
+
+
+class TranslationScheduler():
+    """Engine-wide worker pool shared by every file of every run.
+
+    At most `concurrency` tasks run at once. Pending tasks are queued per key
+    (one key per HTML file) and dispatched round-robin across keys, so every
+    file makes progress instead of the first one hogging the workers.
+    """
+
+    def __init__(self, concurrency=8):
+        self.concurrency = concurrency
+        self.pending = {}
+        self.order = deque()
+        self.condition = threading.Condition()
+        self.workers = []
+
+    def submit(self, key, func, *args):
+        future = Future()
+        with self.condition:
+            if key not in self.pending:
+                self.pending[key] = deque()
+                self.order.append(key)
+            self.pending[key].append((future, func, args))
+            if len(self.workers) < self.concurrency:
+                worker = threading.Thread(target=self._work, daemon=True)
+                worker.start()
+                self.workers.append(worker)
+            self.condition.notify()
+        return future
+
+    def cancel(self, keys):
+        with self.condition:
+            for key in keys:
+                for future, _, _ in self.pending.pop(key, ()):
+                    future.cancel()
+            self.order = deque(key for key in self.order if key in self.pending)
+
+    def _next_task(self):
+        key = self.order.popleft()
+        queue = self.pending[key]
+        task = queue.popleft()
+        if queue:
+            self.order.append(key)
+        else:
+            del self.pending[key]
+        return task
+
+    def _work(self):
+        while True:
+            with self.condition:
+                while not self.order:
+                    self.condition.wait()
+                future, func, args = self._next_task()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(func(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+
+class WordPacker():
+    """Packs the segments of one translate_tag call into chunks on demand.
+
+    Each batch is packed right before it is sent, with the sizes returned by
+    `sizes` at that moment, so chunks follow the latency of the requests that
+    came back in the meantime. Safe to share between threads.
+    """
+
+    def __init__(self, text_list, sizes):
+        self.text_list = text_list
+        self.sizes = sizes
+        self.position = 0
+        self.lock = threading.Lock()
+
+    @property
+    def done(self):
+        return self.position >= len(self.text_list)
+
+    def chunk_end(self, start, max_chars):
+        """End of the chunk starting at `start`, and its packed size."""
+        end = start
+        chunk_size = 0
+        while end < len(self.text_list):
+            text = self.text_list[end]
+            size = len(text.strip()) + len(SEGMENT_MARKER.format(end - start))
+            # A segment that already looks like a marker would confuse the split.
+            isolated = SEGMENT_MARKER_RE.search(text) is not None
+            if end > start and (isolated or chunk_size + size >= max_chars):
+                break
+            end += 1
+            chunk_size += size
+            if isolated:
+                break
+        return end, chunk_size
+
+    def next_batch(self):
+        """Segment indices of the chunks of the next request, or None once everything is packed."""
+        with self.lock:
+            if self.done:
+                return None
+            chunk_chars, batch_chars = self.sizes()
+            chunks = []
+            batch_size = 0
+            while not self.done and len(chunks) < BATCH_MAX_RPCS:
+                end, size = self.chunk_end(self.position, chunk_chars)
+                if chunks and batch_size + size > batch_chars:
+                    break
+                chunks.append(list(range(self.position, end)))
+                self.position = end
+                batch_size += size
+            return chunks
 
 
 class TranslatorEngine():
@@ -169,21 +435,89 @@ class TranslatorEngine():
         self.file_extracted_path = ''
         self.html_list_path = []
         self.translation_dict = {}
+        self.translation_matcher = None
         self.translation_dict_file_path = ''
         self.dict_format = '^[^:]+:[^:]+$'
         self.max_trans_words = 5e3
+        self.max_batch_chars = BATCH_MAX_CHARS
+        self.chunk_sizer = get_default_chunk_sizer()
+        self.packer_stats = {'chunks': 0, 'misaligned_chunks': 0}
+        self.endpoints = None
+        self.proxy_pool = None
+        self.hedge = None
+        self.translator = google_translator(timeout=5)
+        self.backend = 'threads'
+        self.concurrency = 8
+        self.scheduler = None
+        self.cache = None
+        self.in_memory = False
+        self.epub_zip = None
+        self.translated_members = {}
+        self.resume = True
+        self.journal = None
+        self.documents = None
+        self.dedup_stats = {'segments': 0, 'unique_segments': 0}
+        self.dest_langs = None
+        self.editions = None
+        self.edition_lang = None
+        self.keep_documents = False
+        self.fast_html = True
+        self.workers = 0
+        self.process_pool = None
+        self.stage_timers = StageTimers()
+        self.batch_summary = None
+
+    def reset_translator(self):
+        self.translator = google_translator(timeout=5, endpoints=self.endpoints,
+                                            proxy_pool=self.proxy_pool, hedge=self.hedge)
 
     def get_epub_file_info(self, file_path):
         self.file_path = file_path
         self.file_name = os.path.splitext(os.path.basename(file_path))[0]
         self.file_extracted_path = os.path.join(os.path.abspath(
-            os.path.join(file_path, os.pardir)), self.file_name + '_translated')
+            os.path.join(file_path, os.pardir)), translated_name(self.file_name))
+
+    def output_path(self, extension):
+        return os.path.join(os.path.dirname(self.file_extracted_path),
+                            translated_name(self.file_name, self.edition_lang) + extension)
+
+    def open_journal(self):
+        try:
+            fingerprint = TranslationJournal.make_fingerprint(self.file_path, self.dest_lang)
+            self.journal = TranslationJournal(self.output_path('.journal'),
+                                              fingerprint, self.resume)
+        except OSError:
+            print(f'Opening the translation journal: [{pcolors.FAIL} FAIL {pcolors.ENDC}]')
+            self.journal = None
+            return
+        if not self.journal.is_empty:
+            print(f'Resuming an interrupted translation: {len(self.journal.translations)} segments '
+                  f'and {len(self.journal.files)} files already done.')
+
+    def close_journal(self, completed):
+        for edition in self.editions or []:
+            edition.close_journal(completed)
+        if self.journal is not None:
+            if completed or self.journal.is_empty:
+                self.journal.discard()
+            else:
+                self.journal.close()
+            self.journal = None
+
+    def is_committed(self, name):
+        if self.journal is None or self.in_memory:
+            return False
+        return self.journal.is_committed(name, os.path.join(self.file_extracted_path, name))
 
     def extract_epub(self):
+        if self.in_memory:
+            return self.open_epub()
         try:
             with zipfile.ZipFile(self.file_path, 'r') as zip:
                 print('Extracting the epub file...', end='\r')
-                zip.extractall(self.file_extracted_path)
+                # HTML files finished by an interrupted run are kept as they are.
+                zip.extractall(self.file_extracted_path,
+                               [info for info in zip.infolist() if not self.is_committed(info.filename)])
                 print(
                     f'Extracting the epub file: [{pcolors.GREEN} DONE {pcolors.ENDC}]')
             return True
@@ -192,55 +526,241 @@ class TranslatorEngine():
                 f'Extracting the epub file: [{pcolors.FAIL} FAIL {pcolors.ENDC}]')
             return False
 
+    def open_epub(self):
+        try:
+            self.epub_zip = zipfile.ZipFile(self.file_path, 'r')
+            self.translated_members = {}
+            print(f'Reading the epub file: [{pcolors.GREEN} DONE {pcolors.ENDC}]')
+            return True
+        except Exception:
+            print(f'Reading the epub file: [{pcolors.FAIL} FAIL {pcolors.ENDC}]')
+            return False
+
+    def close_epub(self):
+        if self.epub_zip is not None:
+            self.epub_zip.close()
+            self.epub_zip = None
+        self.translated_members = {}
+
     def get_epub_html_path(self):
+        self.html_list_path = []
+        if self.in_memory:
+            self.html_list_path = [info.filename for info in self.epub_zip.infolist()
+                                   if not info.is_dir() and info.filename.lower().endswith(HTML_EXTENSIONS)]
+            return
         for file_type in ['*.[hH][tT][mM][lL]', '*.[xX][hH][tT][mM][lL]', '*.[hH][tT][mM]']:
             self.html_list_path += [str(p.resolve())
                                     for p in list(Path(self.file_extracted_path).rglob(file_type))]
+        self.html_list_path = [html_file for html_file in self.html_list_path
+                               if not self.is_committed(self.member_name(html_file))]
+
+    def member_name(self, html_file):
+        if self.in_memory:
+            return html_file
+        return Path(html_file).relative_to(Path(self.file_extracted_path).resolve()).as_posix()
+
+    def get_scheduler(self):
+        if self.scheduler is None or self.scheduler.concurrency != self.concurrency:
+            self.scheduler = TranslationScheduler(self.concurrency)
+        return self.scheduler
+
+    def get_process_pool(self):
+        """Worker processes for parsing and writing HTML files, or None when
+        that work stays in this process."""
+        if self.workers < 1:
+            return None
+        if self.process_pool is None:
+            self.process_pool = ProcessPoolExecutor(self.workers, initializer=init_worker,
+                                                    initargs=(self.translation_matcher,))
+        return self.process_pool
+
+    def shutdown_workers(self):
+        if self.process_pool is not None:
+            self.process_pool.shutdown()
+            self.process_pool = None
 
-    def multithreads_html_translate(self):
-        pool = ThreadPool(8)
+    def html_source(self):
+        # Worker processes open the epub themselves instead of sharing our zip file.
+        return self.file_path if self.in_memory else None
+
+    def multithreads_html_translate(self, documents=None):
+        try:
+            if documents is None:
+                documents = self.parse_documents()
+            unique_text = self.dedup_segments(documents)
+            translated_text = self.translate_tag(unique_text, desc='Translating')
+            self.write_documents(documents, unique_text, translated_text)
+        except Exception:
+            print(f'Translating epub: [{pcolors.FAIL} FAIL {pcolors.ENDC}]')
+            raise
+
+    def async_html_translate(self, documents=None):
         try:
-            for _ in tqdm.tqdm(pool.imap_unordered(self.translate_html, self.html_list_path), total=len(self.html_list_path), desc='Translating'):
-                pass
+            asyncio.run(self._async_html_translate(documents))
         except Exception:
             print(f'Translating epub: [{pcolors.FAIL} FAIL {pcolors.ENDC}]')
             raise
-        pool.close()
-        pool.join()
 
-    def translate_html(self, html_file):
-        with open(html_file, encoding='utf-8') as f:
-            soup = bs(f, 'xml')
+    async def _async_html_translate(self, documents=None):
+        if documents is None:
+            documents = self.parse_documents()
+        unique_text = self.dedup_segments(documents)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        async with async_google_translator(timeout=5, pool_size=self.concurrency, endpoints=self.endpoints,
+                                           proxy_pool=self.proxy_pool, hedge=self.hedge) as translator:
+            translated_text = await self.async_translate_tag(
+                unique_text, translator, semaphore, desc='Translating')
+        self.write_documents(documents, unique_text, translated_text)
+
+    async def async_translate_tag(self, text_list, translator, semaphore, desc=None):
+        with self.stage_timers.measure('translate_tag'):
+            translated_text = self.lookup_translations(text_list)
+            missing_text = [text for text, translated in zip(text_list, translated_text) if translated is None]
+            missing_text, pieces = self.split_segments(missing_text)
+            extracted_contents, misaligned = await self.async_translate_words(
+                missing_text, translator, semaphore, desc)
+            if misaligned:
+                print(f'Re-translating {len(misaligned)} misaligned chunk(s) segment by segment.')
+                retried = await self.async_translate_texts(
+                    [missing_text[index].strip() for chunk in misaligned for index in chunk],
+                    translator, semaphore)
+                self.fill_words(missing_text, misaligned, retried, extracted_contents)
+
+            return self.merge_translations(text_list, translated_text, self.join_segments(extracted_contents, pieces))
+
+    async def async_translate_words(self, text_list, translator, semaphore, desc=None):
+        """Translate segments packed into chunks, see multithreads_translate_words."""
+        packer = WordPacker(text_list, self.next_chunk_sizes)
+        extracted_text = [None] * len(text_list)
+        misaligned = []
+
+        with tqdm.tqdm(total=len(text_list), desc=desc, disable=desc is None) as progress:
+            async def translate_packed():
+                while True:
+                    async with semaphore:
+                        chunks = packer.next_batch()
+                        if chunks is None:
+                            return
+                        translated_contents = await translator.translate_batch(
+                            [self.pack_words(text_list, chunk) for chunk in chunks], self.dest_lang,
+                            max_chars=self.max_batch_chars)
+                    misaligned.extend(self.extract_words(text_list, chunks, translated_contents, extracted_text))
+                    progress.update(sum(map(len, chunks)))
+
+            tasks = [asyncio.ensure_future(translate_packed()) for _ in range(self.concurrency)]
+            try:
+                await asyncio.gather(*tasks)
+            except Exception:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+        return extracted_text, misaligned
+
+    async def async_translate_texts(self, text_list, translator, semaphore, desc=None):
+        tasks = [asyncio.ensure_future(self.async_translate_batch(batch, translator, semaphore))
+                 for batch in group_batches(text_list, self.max_batch_chars)]
+        try:
+            for task in tqdm.tqdm(asyncio.as_completed(tasks), total=len(tasks), desc=desc, disable=desc is None):
+                await task
+        except Exception:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        return [text for task in tasks for text in task.result()]
+
+    async def async_translate_batch(self, text_list, translator, semaphore):
+        async with semaphore:
+            return await translator.translate_batch(text_list, self.dest_lang, max_chars=self.max_batch_chars)
+
+    def parse_documents(self):
+        with self.stage_timers.measure('parse_html'):
+            process_pool = self.get_process_pool()
+            if process_pool is not None:
+                # Only the text comes back; the files are parsed again when written.
+                text_lists = process_pool.map(parse_task, self.html_list_path, repeat(self.html_source()),
+                                              repeat(self.fast_html), chunksize=4)
+                return [(html_file, None, None, text_list)
+                        for html_file, text_list in zip(self.html_list_path, text_lists)]
+            documents = []
+            for html_file in self.html_list_path:
+                soup, epub_eles, text_list = self.parse_html(html_file)
+                documents.append((html_file, soup, epub_eles, text_list))
+            return documents
+
+    def dedup_segments(self, documents):
+        total = sum(len(document[3]) for document in documents)
+        unique_text = list(dict.fromkeys(
+            text for document in documents for text in document[3]))
+        self.dedup_stats = {'segments': total, 'unique_segments': len(unique_text)}
+        if total:
+            print(f'Unique segments: {len(unique_text)}/{total} '
+                  f'({1 - len(unique_text) / total:.1%} deduplicated)')
+        return unique_text
+
+    def write_documents(self, documents, unique_text, translated_text):
+        process_pool = self.get_process_pool()
+        if process_pool is not None:
+            # The dictionary is applied by the workers, so its time counts as write_html.
+            with self.stage_timers.measure('write_html'):
+                self.write_documents_in_workers(process_pool, documents, dict(zip(unique_text, translated_text)))
+            return
+        with self.stage_timers.measure('replace_translation_dict'):
+            translations = {text: self.replace_translation_dict(translated)
+                            for text, translated in zip(unique_text, translated_text)}
+        with self.stage_timers.measure('write_html'):
+            for html_file, soup, epub_eles, text_list in documents:
+                self.write_html(html_file, soup, epub_eles,
+                                [translations.get(text) for text in text_list])
+
+    def write_documents_in_workers(self, process_pool, documents, translations):
+        """Apply the dictionary and serialize the files in the worker processes,
+        saving each one as soon as it comes back."""
+        futures = {process_pool.submit(render_task, html_file, self.html_source(), self.fast_html,
+                                       [translations.get(text) for text in text_list]): html_file
+                   for html_file, _, _, text_list in documents}
+        try:
+            for future in as_completed(futures):
+                self.store_html(futures[future], future.result())
+        except Exception:
+            for future in futures:
+                future.cancel()
+            raise
 
-            epub_eles = list(soup.descendants)
+    def parse_html(self, html_file):
+        if self.in_memory:
+            data = self.epub_zip.read(html_file)
+        else:
+            with open(html_file, 'rb') as f:
+                data = f.read()
 
-            text_list = []
-            for ele in epub_eles:
-                if isinstance(ele, element.NavigableString) and str(ele).strip() not in ['', 'html']:
-                    text_list.append(str(ele))
+        return parse_html(data, self.fast_html)
 
-            translated_text = self.translate_tag(text_list)
-            nextpos = -1
+    def write_html(self, html_file, soup, epub_eles, translated_text):
+        # Editions keep the tree as parsed, to write it again in the next language.
+        self.store_html(html_file, render_html(soup, epub_eles, translated_text, self.keep_documents))
 
-            for ele in epub_eles:
-                if isinstance(ele, element.NavigableString) and str(ele).strip() not in ['', 'html']:
-                    nextpos += 1
-                    if nextpos < len(translated_text):
-                        content = self.replace_translation_dict(
-                            translated_text[nextpos])
-                        ele.replace_with(element.NavigableString(content))
+    def store_html(self, html_file, content):
+        if self.keep_documents or self.in_memory:
+            self.translated_members[self.member_name(html_file)] = content
+        else:
+            self.write_translated_file(html_file, content)
 
-            with open(html_file, "w", encoding="utf-8") as w:
-                w.write(str(soup))
-            w.close()
-        f.close()
+    def write_translated_file(self, html_file, content):
+        # Write next to the target and rename, so a crash never leaves half a file.
+        temp_file = html_file + '.part'
+        with open(temp_file, "wb") as w:
+            w.write(content)
+            w.flush()
+            os.fsync(w.fileno())
+        os.replace(temp_file, html_file)
+        if self.journal is not None:
+            self.journal.commit_file(self.member_name(html_file), hashlib.sha1(content).hexdigest())
 
     def replace_translation_dict(self, text):
-        if self.translation_dict:
-            for replace_text in self.translation_dict.keys():
-                if replace_text in text:
-                    text = text.replace(
-                        replace_text, self.translation_dict[replace_text])
+        if self.translation_matcher is not None and text is not None:
+            return self.translation_matcher.replace(text)
         return text
 
     def get_translation_dict_contents(self):
@@ -256,132 +776,629 @@ class TranslatorEngine():
                             f'Translation dictionary is not in correct format: {line}')
                         return False
             f.close()
+            self.translation_matcher = DictionaryMatcher(self.translation_dict)
         else:
             print('Translation dictionary file path is incorrect!')
             return False
         return True
 
-    def translate_tag(self, text_list):
-        combined_contents = self.combine_words(text_list)
-        translated_contents = self.multithreads_translate(combined_contents)
-        extracted_contents = self.extract_words(translated_contents)
+    def translate_tag(self, text_list, desc=None):
+        with self.stage_timers.measure('translate_tag'):
+            translated_text = self.lookup_translations(text_list)
+            missing_text = [text for text, translated in zip(text_list, translated_text) if translated is None]
+            missing_text, pieces = self.split_segments(missing_text)
+            extracted_contents, misaligned = self.multithreads_translate_words(missing_text, desc)
+            if misaligned:
+                print(f'Re-translating {len(misaligned)} misaligned chunk(s) segment by segment.')
+                retried = self.multithreads_translate(
+                    [missing_text[index].strip() for chunk in misaligned for index in chunk])
+                self.fill_words(missing_text, misaligned, retried, extracted_contents)
 
-        return extracted_contents
+            return self.merge_translations(text_list, translated_text, self.join_segments(extracted_contents, pieces))
 
-    def translate_text(self, text):
-        translator = google_translator(timeout=5)
-        if type(text) is not str:
-            translate_text = ''
-            for substr in text:
-                translate_substr = translator.translate(substr, self.dest_lang)
-                translate_text += translate_substr
-        else:
-            translate_text = translator.translate(text, self.dest_lang)
-        return translate_text
+    def lookup_translations(self, text_list):
+        translated_text = [None] * len(text_list)
+        if self.cache is not None:
+            cached = self.cache.get_many(text_list, 'auto', self.dest_lang)
+            translated_text = [cached.get(text) for text in text_list]
+        if self.journal is not None:
+            done = self.journal.get_many([text for text, translated in zip(text_list, translated_text)
+                                          if translated is None])
+            if done and self.cache is not None:
+                self.cache.put_many(done.items(), 'auto', self.dest_lang)
+            translated_text = [done.get(text) if translated is None else translated
+                               for text, translated in zip(text_list, translated_text)]
+        return translated_text
+
+    def split_segments(self, text_list):
+        """Cut the segments too long for one request into pieces.
+
+        Return the pieces, and how many pieces each segment became for
+        join_segments. The whitespace around a segment stays with its first
+        and last pieces.
+        """
+        limit = min(int(self.max_trans_words), MAX_CHUNK_CHARS) - 1
+        split_list = []
+        pieces = []
+        for text in text_list:
+            stripped = text.strip()
+            if len(stripped) <= limit:
+                split_list.append(text)
+                pieces.append(1)
+                continue
+            start = text.index(stripped)
+            parts = split_text(stripped, limit)
+            parts[0] = text[:start] + parts[0]
+            parts[-1] += text[start + len(stripped):]
+            split_list += parts
+            pieces.append(len(parts))
+        return split_list, pieces
 
-    def multithreads_translate(self, text_list):
-        results = []
-        pool = ThreadPool(8)
+    def join_segments(self, translated_text, pieces):
+        joined = []
+        position = 0
+        for count in pieces:
+            parts = translated_text[position:position + count]
+            joined.append(None if None in parts else ''.join(parts))
+            position += count
+        return joined
+
+    def merge_translations(self, text_list, translated_text, extracted_contents):
+        missing = [index for index, translated in enumerate(translated_text) if translated is None]
+        if self.cache is not None:
+            self.cache.put_many([(text_list[index], translated)
+                                 for index, translated in zip(missing, extracted_contents)
+                                 if translated is not None],
+                                'auto', self.dest_lang)
+        merged = list(translated_text)
+        for index, translated in zip(missing, extracted_contents):
+            merged[index] = translated
+        return merged
+
+    def translate_batch(self, text_list):
+        return self.translator.translate_batch(text_list, self.dest_lang, max_chars=self.max_batch_chars)
+
+    def record_journal(self, text_list, translated_text):
+        if self.journal is not None:
+            self.journal.put_many(zip(text_list, translated_text))
+
+    def multithreads_translate(self, text_list, desc=None):
+        scheduler = self.get_scheduler()
+        key = object()
+        futures = [scheduler.submit(key, self.translate_batch, batch)
+                   for batch in group_batches(text_list, self.max_batch_chars)]
         try:
-            results = pool.map(self.translate_text, text_list)
+            for future in tqdm.tqdm(as_completed(futures), total=len(futures), desc=desc, disable=desc is None):
+                future.result()
         except Exception:
-            print(f'Translating epub: [{pcolors.FAIL} FAIL {pcolors.ENDC}]')
+            scheduler.cancel([key])
             raise
-        pool.close()
-        pool.join()
-        return results
+        return [text for future in futures for text in future.result()]
 
-    def combine_words(self, text_list):
-        combined_text = []
-        combined_single = ''
-        for text in text_list:
-            combined_single_prev = combined_single
-            if combined_single:
-                combined_single += '\n-----\n' + text
-            else:
-                combined_single = text
-            if len(combined_single) >= self.max_trans_words:
-                combined_text.append(combined_single_prev)
-                combined_single = '\n-----\n' + text
-        combined_text.append(combined_single)
-        return combined_text
-
-    def extract_words(self, text_list):
-        extracted_text = []
-        for text in text_list:
-            extract = text.split('-----')
-            extracted_text += extract
-        return extracted_text
+    def multithreads_translate_words(self, text_list, desc=None):
+        """Translate segments packed into chunks.
 
-    def zip_epub(self):
-        print('Making the translated epub file...', end='\r')
+        Return the translated segments and the chunks whose markers did not
+        survive. Batches are packed by the workers as they pick them up (see
+        WordPacker); only a couple of them per worker are queued at a time.
+        """
+        packer = WordPacker(text_list, self.next_chunk_sizes)
+        extracted_text = [None] * len(text_list)
+        misaligned = []
+        scheduler = self.get_scheduler()
+        key = object()
+        futures = set()
         try:
-            # zipf = zipfile.ZipFile(
-            #     self.file_extracted_path + '.epub', 'w', zipfile.ZIP_DEFLATED)
-            # self.zipdir(self.file_extracted_path, zipf)
-            # zipf.writestr("mimetype", "application/epub+zip")
-            # zipf.close()
-
-            filename = f"{self.file_extracted_path}.epub"
-            file_extracted_absolute_path = Path(self.file_extracted_path)
-
-            with open(str(file_extracted_absolute_path / 'mimetype'), 'w') as file:
-                file.write('application/epub+zip')
-            with zipfile.ZipFile(filename, 'w') as archive:
-                archive.write(
-                    str(file_extracted_absolute_path / 'mimetype'), 'mimetype',
-                    compress_type=zipfile.ZIP_STORED)
-                for file in file_extracted_absolute_path.rglob('*.*'):
-                    archive.write(
-                        str(file), str(file.relative_to(
-                            file_extracted_absolute_path)),
-                        compress_type=zipfile.ZIP_DEFLATED)
+            with tqdm.tqdm(total=len(text_list), desc=desc, disable=desc is None) as progress:
+                while futures or not packer.done:
+                    while not packer.done and len(futures) < 2 * self.concurrency:
+                        futures.add(scheduler.submit(key, self.translate_packed, packer))
+                    done, futures = wait(futures, return_when=FIRST_COMPLETED)
+                    # Keep what came back before raising a failure, so the journal has it.
+                    for future in sorted(done, key=lambda future: future.exception() is not None):
+                        chunks, translated_contents = future.result()
+                        misaligned += self.extract_words(text_list, chunks, translated_contents, extracted_text)
+                        progress.update(sum(map(len, chunks)))
+        except Exception:
+            scheduler.cancel([key])
+            # Requests already sent are waited for and journaled too; the
+            # cancelled ones never run, so they are not waited for.
+            for future in wait([future for future in futures if not future.cancelled()]).done:
+                if future.exception() is None:
+                    chunks, translated_contents = future.result()
+                    self.extract_words(text_list, chunks, translated_contents, extracted_text)
+            raise
+        return extracted_text, misaligned
 
-            shutil.rmtree(self.file_extracted_path)
-            print(
-                f'Making the translated epub file: [{pcolors.GREEN} DONE {pcolors.ENDC}]')
-        except Exception as e:
-            print(e)
-            print(
-                f'Making the translated epub file: [{pcolors.FAIL} FAIL {pcolors.ENDC}]')
+    def translate_packed(self, packer):
+        chunks = packer.next_batch()
+        if chunks is None:
+            return [], []
+        return chunks, self.translate_batch([self.pack_words(packer.text_list, chunk) for chunk in chunks])
+
+    def next_chunk_sizes(self):
+        """Character limits of the next chunk and of the next request."""
+        if self.chunk_sizer is None:
+            return self.max_trans_words, self.max_batch_chars
+        chunk_chars = min(self.max_trans_words, self.chunk_sizer.size())
+        # Requests shrink along with the chunks, or they would not get any faster.
+        return chunk_chars, max(chunk_chars, self.max_batch_chars * chunk_chars / self.max_trans_words)
+
+    def pack_words(self, text_list, chunk):
+        packed = [text_list[chunk[0]].strip()]
+        for position, index in enumerate(chunk[1:], 1):
+            packed.append(SEGMENT_MARKER.format(position))
+            packed.append(text_list[index].strip())
+        return ''.join(packed)
+
+    def extract_words(self, text_list, chunks, translated_contents, extracted_text):
+        """Split translated chunks back into segments of `extracted_text` and journal them.
+
+        A chunk whose markers did not survive translation in order, or that
+        came back empty, is left out and returned in the misaligned list, so
+        only its segments need to be sent again.
+        """
+        misaligned = []
+        extracted = []
+        for chunk, translated in zip(chunks, translated_contents):
+            if translated is None:
+                misaligned.append(chunk)
+                continue
+            pieces = SEGMENT_MARKER_RE.split(translated)
+            words = pieces[0::2]
+            markers = pieces[1::2]
+            if len(words) != len(chunk) or markers != [str(position) for position in range(1, len(chunk))]:
+                misaligned.append(chunk)
+                continue
+            for index, word in zip(chunk, words):
+                extracted_text[index] = self.restore_spacing(text_list[index], word)
+            extracted += chunk
+        self.packer_stats['chunks'] += len(chunks)
+        self.packer_stats['misaligned_chunks'] += len(misaligned)
+        self.record_journal([text_list[index] for index in extracted],
+                            [extracted_text[index] for index in extracted])
+        return misaligned
+
+    def fill_words(self, text_list, chunks, translated_words, extracted_text):
+        indices = [index for chunk in chunks for index in chunk]
+        for index, word in zip(indices, translated_words):
+            if word is None:
+                raise google_new_transError(f'No translation for the segment {text_list[index].strip()[:50]!r}')
+            extracted_text[index] = self.restore_spacing(text_list[index], word)
+        self.record_journal([text_list[index] for index in indices],
+                            [extracted_text[index] for index in indices])
+
+    def restore_spacing(self, original, translated):
+        stripped = original.strip()
+        if not stripped:
+            return original
+        start = original.index(stripped)
+        return original[:start] + translated.strip() + original[start + len(stripped):]
+
+    def zip_epub(self):
+        with self.stage_timers.measure('zip_epub'):
+            print('Making the translated epub file...', end='\r')
+            try:
+                filename = self.output_path('.epub')
+                if self.in_memory:
+                    self.write_epub(self.epub_zip, filename)
+                else:
+                    with zipfile.ZipFile(self.file_path, 'r') as source:
+                        self.write_epub(source, filename)
+                    if not self.keep_documents:
+                        shutil.rmtree(self.file_extracted_path)
+                print(
+                    f'Making the translated epub file: [{pcolors.GREEN} DONE {pcolors.ENDC}]')
+                return True
+            except Exception as e:
+                print(e)
+                print(
+                    f'Making the translated epub file: [{pcolors.FAIL} FAIL {pcolors.ENDC}]')
+                return False
+
+    def write_epub(self, source, filename):
+        with zipfile.ZipFile(filename, 'w') as archive:
+            archive.writestr('mimetype', 'application/epub+zip',
+                             compress_type=zipfile.ZIP_STORED)
+            for info in source.infolist():
+                if info.filename == 'mimetype' or info.is_dir():
+                    continue
+                content = self.get_translated_member(info.filename)
+                if content is not None:
+                    archive.writestr(copy_zip_info(info), content,
+                                     compress_type=zipfile.ZIP_DEFLATED)
+                else:
+                    copy_zip_member(source, archive, info)
+
+    def get_translated_member(self, name):
+        if self.in_memory or self.keep_documents:
+            return self.translated_members.get(name)
+        if name.lower().endswith(HTML_EXTENSIONS):
+            html_file = os.path.join(self.file_extracted_path, name)
+            if os.path.isfile(html_file):
+                with open(html_file, 'rb') as f:
+                    return f.read()
+        return None
 
     def zipdir(self, path, ziph):
         for root, dirs, files in os.walk(path):
             for file in files:
                 ziph.write(os.path.join(root, file),
                            os.path.relpath(os.path.join(root, file),
-                                           os.path.join(path, self.file_name + '_translated' + '\.')))
+                                           os.path.join(path, translated_name(self.file_name) + '\.')))
 
-    def start(self, file_path):
+    def is_fan_out(self):
+        return self.dest_langs is not None and len(self.dest_langs) > 1
+
+    def prepare_book(self, file_path):
+        """Extract the book and parse its HTML files, ready for translate_book."""
         self.get_epub_file_info(file_path)
-        if self.extract_epub():
+        if not self.is_fan_out():
+            self.open_journal()
+        with self.stage_timers.measure('extract_epub'):
+            extracted = self.extract_epub()
+        if not extracted:
+            self.close_journal(False)
+            return False
+        try:
             self.get_epub_html_path()
-            self.multithreads_html_translate()
-            self.zip_epub()
+            self.documents = self.parse_documents()
+        except Exception:
+            self.close_epub()
+            self.close_journal(False)
+            raise
+        return True
+
+    def translate_book(self):
+        documents, self.documents = self.documents, None
+        if self.is_fan_out():
+            self.translate_editions(documents)
+        elif self.backend == 'asyncio':
+            self.async_html_translate(documents)
+        else:
+            self.multithreads_html_translate(documents)
+
+    def new_edition(self, dest_lang):
+        """A copy of the prepared book that is translated into `dest_lang`.
+
+        Editions share the parsed documents of the book, so their translated
+        HTML is kept in memory and written to `[original_file]_translated_[lang].epub`.
+        """
+        edition = copy.copy(self)
+        edition.dest_lang = dest_lang
+        edition.dest_langs = None
+        edition.editions = None
+        edition.edition_lang = dest_lang
+        edition.keep_documents = True
+        edition.translated_members = {}
+        edition.packer_stats = {'chunks': 0, 'misaligned_chunks': 0}
+        edition.journal = None
+        edition.open_journal()
+        return edition
+
+    def translate_editions(self, documents):
+        """Translate the segments of the book into every destination language at once."""
+        if self.backend != 'asyncio':
+            # Created before the editions copy this engine, so they all share it.
+            self.get_scheduler()
+        self.editions = [self.new_edition(dest_lang) for dest_lang in self.dest_langs]
+        unique_text = self.dedup_segments(documents)
+        try:
+            if self.backend == 'asyncio':
+                translations = asyncio.run(self._async_translate_editions(unique_text))
+            else:
+                with ThreadPoolExecutor(max_workers=len(self.editions)) as executor:
+                    translations = list(executor.map(
+                        lambda edition: edition.translate_tag(unique_text, desc=f'Translating ({edition.dest_lang})'),
+                        self.editions))
+        except Exception:
+            print(f'Translating epub: [{pcolors.FAIL} FAIL {pcolors.ENDC}]')
+            raise
+        for edition, translated_text in zip(self.editions, translations):
+            edition.write_documents(documents, unique_text, translated_text)
+
+    async def _async_translate_editions(self, unique_text):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        async with async_google_translator(timeout=5, pool_size=self.concurrency, endpoints=self.endpoints,
+                                           proxy_pool=self.proxy_pool, hedge=self.hedge) as translator:
+            return await asyncio.gather(*[
+                edition.async_translate_tag(unique_text, translator, semaphore,
+                                            desc=f'Translating ({edition.dest_lang})')
+                for edition in self.editions])
+
+    def package_editions(self):
+        completed = True
+        for edition in self.editions:
+            edition_completed = edition.zip_epub()
+            edition.close_journal(edition_completed)
+            completed = completed and edition_completed
+        if completed and not self.in_memory:
+            shutil.rmtree(self.file_extracted_path)
+        return completed
+
+    def package_book(self):
+        completed = False
+        try:
+            completed = self.package_editions() if self.editions else self.zip_epub()
+        finally:
+            self.close_epub()
+            self.close_journal(completed)
+        return completed
+
+    def close_cache(self):
+        # Stats stay readable, for the --stats report written afterwards.
+        if self.cache is not None:
+            self.cache.close()
+
+    def start(self, file_path):
+        try:
+            if not self.prepare_book(file_path):
+                return False
+            try:
+                self.translate_book()
+            except Exception:
+                self.close_epub()
+                self.close_journal(False)
+                raise
+            completed = self.package_book()
+            self.print_stats()
+            return completed
+        finally:
+            self.close_cache()
+
+    def new_book(self):
+        """A copy of the engine for one book of a batch. The translator,
+        scheduler, cache, dictionary and pools are shared with the batch."""
+        book = copy.copy(self)
+        book.html_list_path = []
+        book.packer_stats = {'chunks': 0, 'misaligned_chunks': 0}
+        book.dedup_stats = {'segments': 0, 'unique_segments': 0}
+        book.epub_zip = None
+        book.translated_members = {}
+        book.journal = None
+        book.documents = None
+        book.editions = None
+        return book
+
+    def start_batch(self, file_paths):
+        try:
+            return self.translate_books(file_paths)
+        finally:
+            self.close_cache()
+
+    def translate_books(self, file_paths):
+        """Translate several books in one process.
+
+        While a book is being translated, the next one is extracted and parsed
+        and the previous one is packaged in the background. A book that fails
+        does not stop the batch; its journal is kept so it can be resumed.
+        """
+        if self.backend != 'asyncio':
+            self.get_scheduler()
+        self.get_process_pool()
+        summary = []
+        packaging = []
+
+        def prepare(file_path):
+            book = self.new_book()
+            started = time.monotonic()
+            try:
+                return book, started, book.prepare_book(file_path)
+            except Exception as e:
+                print(f'Preparing {os.path.basename(file_path)}: {e}')
+                return book, started, False
+
+        def package(book, started, entry):
+            entry['status'] = 'DONE' if book.package_book() else 'FAIL'
+            entry['seconds'] = time.monotonic() - started
+
+        with ThreadPoolExecutor(max_workers=1) as preparer, ThreadPoolExecutor(max_workers=1) as packager:
+            prepared = preparer.submit(prepare, file_paths[0])
+            for index, file_path in enumerate(file_paths):
+                book, started, ready = prepared.result()
+                if index + 1 < len(file_paths):
+                    prepared = preparer.submit(prepare, file_paths[index + 1])
+                entry = {'book': os.path.basename(file_path), 'status': 'FAIL', 'seconds': 0.0,
+                         'segments': 0, 'unique_segments': 0}
+                summary.append(entry)
+                print(f'[{index + 1}/{len(file_paths)}] {file_path}')
+                if not ready:
+                    entry['seconds'] = time.monotonic() - started
+                    continue
+                try:
+                    book.translate_book()
+                except Exception as e:
+                    print(e)
+                    book.close_epub()
+                    book.close_journal(False)
+                    entry['seconds'] = time.monotonic() - started
+                    continue
+                entry.update(book.dedup_stats)
+                entry.update(book.get_packer_stats())
+                packaging.append(packager.submit(package, book, started, entry))
+            for future in packaging:
+                future.result()
+
+        self.batch_summary = summary
+        self.print_batch_summary(summary)
+        self.print_stats()
+        return all(entry['status'] == 'DONE' for entry in summary)
+
+    def print_batch_summary(self, summary):
+        width = max(len(entry['book']) for entry in summary)
+        print('Batch summary:')
+        for entry in summary:
+            color = pcolors.GREEN if entry['status'] == 'DONE' else pcolors.FAIL
+            print(f'  {entry["book"]:<{width}}  [{color} {entry["status"]} {pcolors.ENDC}]  '
+                  f'{entry["unique_segments"]}/{entry["segments"]} segments  {entry["seconds"]:.1f}s')
+        done = sum(entry['status'] == 'DONE' for entry in summary)
+        print(f'{done}/{len(summary)} books translated.')
+
+    def get_packer_stats(self):
+        if not self.editions:
+            return dict(self.packer_stats)
+        return {name: sum(edition.packer_stats[name] for edition in self.editions)
+                for name in self.packer_stats}
+
+    def stats_report(self):
+        """Everything measured during the run, as a dict for --stats."""
+        latency = get_default_latency()
+        report = {
+            'version': tool_version,
+            'stages': self.stage_timers.snapshot(),
+            'requests': {
+                'latency': latency.snapshot(),
+                'p50_seconds': latency.quantile(0.5),
+                'p90_seconds': latency.quantile(0.9),
+                'p99_seconds': latency.quantile(0.99),
+            },
+            'rate_limiter': get_default_limiter().stats(),
+            'connections': get_default_pool().stats(),
+            'chunk_sizes': self.chunk_sizer.stats() if self.chunk_sizer is not None else None,
+            'hedging': self.hedge.stats() if self.hedge is not None else None,
+            'cache': self.cache.stats() if self.cache is not None else None,
+            'endpoints': self.endpoints.stats() if self.endpoints is not None else None,
+            'proxies': self.proxy_pool.stats() if self.proxy_pool is not None else None,
+        }
+        if self.batch_summary is not None:
+            report['books'] = self.batch_summary
+            report['segments'] = {name: sum(entry[name] for entry in self.batch_summary)
+                                  for name in self.dedup_stats}
+            report['packer'] = {name: sum(entry.get(name, 0) for entry in self.batch_summary)
+                                for name in self.packer_stats}
+        else:
+            report['segments'] = dict(self.dedup_stats)
+            report['packer'] = self.get_packer_stats()
+        return report
+
+    def write_stats(self, path, format='json'):
+        try:
+            write_report(self.stats_report(), path, format)
+            print(f'Writing the stats report: [{pcolors.GREEN} DONE {pcolors.ENDC}]')
+        except OSError as e:
+            print(e)
+            print(f'Writing the stats report: [{pcolors.FAIL} FAIL {pcolors.ENDC}]')
+
+    def print_stats(self):
+        if self.chunk_sizer is not None:
+            chosen = self.chunk_sizer.stats()['chosen']
+            if chosen['count']:
+                print(f'Chunk size: {chosen["mean"]:.0f} characters on average '
+                      f'({chosen["min"]}-{chosen["max"]}, {chosen["count"]} requests)')
+        if self.hedge is not None:
+            stats = self.hedge.stats()
+            print(f'Hedged requests: {stats["hedged"]}/{stats["requests"]}, {stats["hedge_wins"]} won by the hedge, '
+                  f'{stats["primary_wins"]} by the original request')
+        if self.cache is not None:
+            stats = self.cache.stats()
+            print(f'Translation memory: {stats["hits"]} hits, {stats["misses"]} misses, '
+                  f'{stats["entries"]} entries')
+        if self.endpoints is not None:
+            for url_base, stats in self.endpoints.stats().items():
+                latency = f'{stats["latency"] * 1000:.0f}ms' if stats['latency'] is not None else '-'
+                print(f'{url_base}: {stats["requests"]} requests, {stats["errors"]} errors, '
+                      f'{stats["ejections"]} ejections, latency {latency}')
+        if self.proxy_pool is not None:
+            for proxy_name, stats in self.proxy_pool.stats().items():
+                print(f'{proxy_name}: {stats["requests"]} requests, {stats["successes"]} ok, '
+                      f'{stats["throttled"]} throttled, {stats["timeouts"]} timeouts, '
+                      f'{stats["quarantines"]} quarantines')
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     parser = argparse.ArgumentParser(
         description='A tool for translating epub files to different languages using the Google Translate, with support for custom dictionaries.')
     parser.add_argument('-v', '--version', action='version',
                         version='epub-translator v%s' % tool_version)
-    parser.add_argument('epub_file_path', type=str,
-                        help='path to the epub file')
+    parser.add_argument('epub_file_path', type=str, nargs='*',
+                        help='path to the epub file, or to a folder of epub files; several can be given')
     parser.add_argument('-l', '--lang', type=str, metavar='dest_lang',
-                        help='destination language')
+                        help='destination language, or several comma separated languages, e.g. vi,en,es')
     parser.add_argument('-d', '--dict', type=str, metavar='dict_path',
                         help='path to the translation dictionary')
+    parser.add_argument('--jobs', type=str, metavar='jobs_path',
+                        help='file listing one epub file or folder per line to translate')
+    parser.add_argument('-b', '--backend', type=str, choices=['threads', 'asyncio'],
+                        default='threads', help='translation backend (default: threads)')
+    parser.add_argument('-c', '--concurrency', type=int, metavar='N', default=8,
+                        help='maximum number of translation requests in flight (default: 8)')
+    parser.add_argument('-w', '--workers', type=int, metavar='N', default=0,
+                        help='number of processes parsing and writing the HTML files (default: 0, '
+                             'in the main process)')
+    parser.add_argument('--in-memory', action='store_true',
+                        help='translate the epub file in memory without extracting it to disk')
+    parser.add_argument('--cache-dir', type=str, metavar='cache_dir',
+                        help='directory of the translation memory cache')
+    parser.add_argument('--cache-size', type=int, metavar='MB', default=DEFAULT_CACHE_SIZE // 2**20,
+                        help='maximum size of the translation memory in MB (default: %(default)s)')
+    parser.add_argument('--no-update-check', action='store_true',
+                        help='do not look for a newer release of the tool')
+    parser.add_argument('--no-resume', action='store_true',
+                        help='start over instead of resuming an interrupted translation')
+    parser.add_argument('--endpoints', type=str, metavar='suffixes',
+                        help='comma separated Google Translate domains to spread requests over, e.g. com,de,fr')
+    parser.add_argument('--proxies', type=str, metavar='proxies',
+                        help='comma separated proxy URLs, or a file with one proxy URL per line')
+    parser.add_argument('--proxy-strategy', type=str, choices=ProxyPool.STRATEGIES, default='round-robin',
+                        help='how to pick the proxy of each request (default: %(default)s)')
+    parser.add_argument('--hedge', type=float, metavar='budget', nargs='?', const=HEDGE_BUDGET,
+                        help='send a second copy of requests slower than the 95th percentile latency, '
+                             f'at most budget copies per request (default: {HEDGE_BUDGET})')
+    parser.add_argument('--stats', type=str, metavar='stats_path',
+                        help='write the stage timings, request latencies and counters of the run to this file')
+    parser.add_argument('--stats-format', type=str, choices=['json', 'prometheus'], default='json',
+                        help='format of the --stats file (default: json)')
     args = parser.parse_args()
 
     engine = TranslatorEngine()
+    engine.backend = args.backend
+    engine.concurrency = max(1, args.concurrency)
+    engine.workers = max(0, args.workers)
+    engine.in_memory = args.in_memory
+    engine.resume = not args.no_resume
+    if args.cache_dir:
+        engine.cache = TranslationMemory(os.path.abspath(args.cache_dir), args.cache_size * 2**20)
 
-    check_for_tool_updates()
+    if args.endpoints:
+        url_suffixes = [suffix.strip() for suffix in args.endpoints.split(',') if suffix.strip()]
+        unknown_suffixes = [suffix for suffix in url_suffixes if suffix not in URLS_SUFFIX]
+        if unknown_suffixes or not url_suffixes:
+            print('Can not find Google Translate domain: ' + ', '.join(unknown_suffixes or [args.endpoints]))
+            sys.exit()
+        engine.endpoints = EndpointPool(url_suffixes)
 
-    if args.lang and args.lang not in LANGUAGES.keys():
-        print('Can not find destination language: ' + args.lang)
-        sys.exit()
-    elif args.lang:
-        engine.dest_lang = args.lang
+    if args.proxies:
+        if os.path.isfile(args.proxies):
+            with open(args.proxies, 'r', encoding='utf-8') as proxy_file:
+                proxy_urls = [line.strip() for line in proxy_file
+                              if line.strip() and not line.startswith('#')]
+        else:
+            proxy_urls = [url.strip() for url in args.proxies.split(',') if url.strip()]
+        if not proxy_urls:
+            print('Can not find any proxy in: ' + args.proxies)
+            sys.exit()
+        engine.proxy_pool = ProxyPool(proxy_urls, args.proxy_strategy, pool_size=engine.concurrency)
+
+    if args.hedge is not None:
+        engine.hedge = HedgePolicy(budget=max(0.0, args.hedge))
+
+    if engine.endpoints is not None or engine.proxy_pool is not None or engine.hedge is not None:
+        engine.reset_translator()
+
+    update_checker = UpdateChecker()
+    if not args.no_update_check:
+        update_checker.start()
+
+    if args.lang:
+        dest_langs = list(dict.fromkeys(lang.strip() for lang in args.lang.split(',') if lang.strip()))
+        for dest_lang in dest_langs or [args.lang]:
+            if dest_lang not in LANGUAGES.keys():
+                print('Can not find destination language: ' + dest_lang)
+                sys.exit()
+        engine.dest_lang = dest_langs[0]
+        if len(dest_langs) > 1:
+            engine.dest_langs = dest_langs
 
     if args.dict:
         translation_dict_file_path = args.dict.replace(
@@ -391,11 +1408,39 @@ if __name__ == "__main__":
         if not engine.get_translation_dict_contents():
             sys.exit()
 
-    epub_file_path = args.epub_file_path.replace(
-        '&', '').replace('\'', '').replace('\"', '').strip()
-    epub_abs_file_path = os.path.abspath(epub_file_path)
-    if os.path.isfile(epub_abs_file_path) and epub_abs_file_path.endswith('.epub'):
-        engine.start(epub_abs_file_path)
-    else:
-        print('Epub file path is incorrect!')
+    epub_file_paths = list(args.epub_file_path)
+    if args.jobs:
+        if not os.path.isfile(args.jobs):
+            print('Jobs file path is incorrect!')
+            sys.exit()
+        with open(args.jobs, 'r', encoding='utf-8') as jobs_file:
+            epub_file_paths += [line.strip() for line in jobs_file
+                                if line.strip() and not line.startswith('#')]
+    if not epub_file_paths:
+        parser.error('the following arguments are required: epub_file_path')
+
+    epub_abs_file_paths = []
+    for epub_file_path in epub_file_paths:
+        epub_file_path = epub_file_path.replace(
+            '&', '').replace('\'', '').replace('\"', '').strip()
+        epub_abs_file_path = os.path.abspath(epub_file_path)
+        if os.path.isdir(epub_abs_file_path):
+            epub_abs_file_paths += find_epub_files(epub_abs_file_path)
+        elif os.path.isfile(epub_abs_file_path) and epub_abs_file_path.endswith('.epub'):
+            epub_abs_file_paths.append(epub_abs_file_path)
+        else:
+            print('Epub file path is incorrect: ' + epub_file_path)
+            sys.exit()
+    epub_abs_file_paths = list(dict.fromkeys(epub_abs_file_paths))
+    if not epub_abs_file_paths:
+        print('Can not find any epub file to translate!')
         sys.exit()
+
+    if len(epub_abs_file_paths) == 1:
+        engine.start(epub_abs_file_paths[0])
+    else:
+        engine.start_batch(epub_abs_file_paths)
+    engine.shutdown_workers()
+    if args.stats:
+        engine.write_stats(os.path.abspath(args.stats), args.stats_format)
+    update_checker.finish()
@@ -0,0 +1,98 @@
+import zipfile
+
+from bs4 import BeautifulSoup as bs
+from bs4 import element
+from lxml_document import LxmlDocument
+
+MAX_OPEN_ARCHIVES = 2
+
+_worker = {'translation_matcher': None, 'archives': {}}
+
+
+def is_text_node(ele):
+    # Comments, processing instructions and the doctype are strings too, but not text.
+    return isinstance(ele, element.NavigableString) and not isinstance(ele, element.PreformattedString)
+
+
+def is_segment_node(ele):
+    return is_text_node(ele) and str(ele).strip() not in ['', 'html']
+
+
+def parse_html(data, fast_html=True):
+    """Parse the bytes of an HTML file into (document, elements, text_list).
+
+    With `fast_html`, the document is an LxmlDocument and elements is None,
+    unless the file needs BeautifulSoup.
+    """
+    if fast_html:
+        document = LxmlDocument.parse(data)
+        if document is not None:
+            return document, None, document.text_list
+
+    soup = bs(data.decode('utf-8'), 'xml')
+    epub_eles = list(soup.descendants)
+    text_list = [str(ele) for ele in epub_eles if is_segment_node(ele)]
+    return soup, epub_eles, text_list
+
+
+def render_html(document, epub_eles, translated_text, keep_document=False):
+    """Serialize a parsed HTML file with its text replaced by `translated_text`.
+
+    A None translation keeps the source text. With `keep_document`, the tree
+    is left as parsed so it can be rendered again in another language.
+    """
+    if epub_eles is None:
+        return document.render(translated_text).encode('utf-8')
+
+    nextpos = -1
+    replaced = []
+    for ele in epub_eles:
+        if is_segment_node(ele):
+            nextpos += 1
+            if nextpos < len(translated_text) and translated_text[nextpos] is not None:
+                translated = element.NavigableString(translated_text[nextpos])
+                ele.replace_with(translated)
+                if keep_document:
+                    replaced.append((ele, translated))
+
+    content = str(document).encode('utf-8')
+    for ele, translated in replaced:
+        translated.replace_with(ele)
+    return content
+
+
+def init_worker(translation_matcher):
+    _worker['translation_matcher'] = translation_matcher
+
+
+def read_html(html_file, epub_path=None):
+    """Bytes of an extracted HTML file, or of a member of `epub_path`."""
+    if epub_path is None:
+        with open(html_file, 'rb') as f:
+            return f.read()
+    archives = _worker['archives']
+    if epub_path not in archives:
+        # A batch moves on to the next book, so only the latest archives stay open.
+        while len(archives) >= MAX_OPEN_ARCHIVES:
+            archives.pop(next(iter(archives))).close()
+        archives[epub_path] = zipfile.ZipFile(epub_path, 'r')
+    return archives[epub_path].read(html_file)
+
+
+def parse_task(html_file, epub_path, fast_html):
+    """Process pool task: the text segments of one HTML file."""
+    return parse_html(read_html(html_file, epub_path), fast_html)[2]
+
+
+def render_task(html_file, epub_path, fast_html, translated_text):
+    """Process pool task: one HTML file, dictionary applied and serialized.
+
+    The file is parsed again here, as parsed trees do not travel between
+    processes.
+    """
+    translation_matcher = _worker['translation_matcher']
+    if translation_matcher is not None:
+        translated_text = [translation_matcher.replace(text) if text is not None else None
+                           for text in translated_text]
+    document, epub_eles, _ = parse_html(read_html(html_file, epub_path), fast_html)
+    return render_html(document, epub_eles, translated_text)
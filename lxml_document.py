@@ -0,0 +1,170 @@
+import re
+
+from lxml import etree
+
+XML_PREFIX = '<?xml version="1.0" encoding="utf-8"?>\n'
+XML_NAMESPACE = 'http://www.w3.org/XML/1998/namespace'
+ASCII_SPACES = '\x20\x0a\x09\x0c\x0d'
+XML_DECLARATION_RE = re.compile(rb'^<\?xml[^>]*encoding\s*=\s*["\']([^"\']+)["\']')
+INTERNAL_SUBSET_RE = re.compile(rb'<!DOCTYPE[^>\[]*\[')
+
+
+def collapse_whitespace(text):
+    # BeautifulSoup keeps a whitespace-only string as a single newline or space.
+    if text and not text.strip(ASCII_SPACES):
+        return '\n' if '\n' in text else ' '
+    return text
+
+
+def escape_text(text):
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def quote_attribute(value):
+    value = escape_text(value)
+    if '"' in value:
+        if "'" in value:
+            return '"' + value.replace('"', '&quot;') + '"'
+        return "'" + value + "'"
+    return '"' + value + '"'
+
+
+def is_segment(text):
+    return text is not None and text.strip() not in ('', 'html')
+
+
+class LxmlDocument():
+    """An XHTML file parsed with lxml, written back exactly like BeautifulSoup's
+    'xml' builder would write it.
+
+    `text_list` holds the text nodes to translate, in document order, and
+    `render` serializes the tree with those nodes replaced. The tree is never
+    modified, so a document can be rendered once per destination language.
+    Use `parse` to build one; it returns None for the rare files this fast
+    path cannot reproduce byte for byte, which then go through BeautifulSoup.
+    """
+
+    def __init__(self, root, doctype):
+        self.root = root
+        self.doctype = doctype
+        self.text_list = []
+        self._collect(root)
+
+    @classmethod
+    def parse(cls, data):
+        if data.startswith(b'\xef\xbb\xbf'):
+            return None
+        declaration = XML_DECLARATION_RE.match(data)
+        if declaration and declaration.group(1).lower().replace(b'-', b'') != b'utf8':
+            return None
+        try:
+            data.decode('utf-8')
+        except UnicodeDecodeError:
+            return None
+        parser = etree.XMLParser(recover=True, resolve_entities=False, no_network=True,
+                                 remove_blank_text=False, huge_tree=True)
+        try:
+            root = etree.fromstring(data, parser)
+        except etree.XMLSyntaxError:
+            return None
+        if root is None:
+            return None
+        docinfo = root.getroottree().docinfo
+        doctype = None
+        if docinfo.doctype:
+            if INTERNAL_SUBSET_RE.search(data) or root.getprevious() is not None:
+                return None
+            doctype = docinfo.root_name or ''
+            if docinfo.public_id is not None:
+                doctype += ' PUBLIC "%s"' % docinfo.public_id
+                if docinfo.system_url is not None:
+                    doctype += ' "%s"' % docinfo.system_url
+            elif docinfo.system_url is not None:
+                doctype += ' SYSTEM "%s"' % docinfo.system_url
+        for node in root.iter(etree.Entity):
+            return None
+        return cls(root, doctype)
+
+    def _collect(self, element):
+        text_list = self.text_list
+        if element.tag is not etree.Comment and element.tag is not etree.PI:
+            text = collapse_whitespace(element.text)
+            if is_segment(text):
+                text_list.append(text)
+            for child in element:
+                self._collect(child)
+        if element is not self.root:
+            tail = collapse_whitespace(element.tail)
+            if is_segment(tail):
+                text_list.append(tail)
+
+    def render(self, translated_text):
+        translated = iter(translated_text)
+        pieces = [XML_PREFIX]
+        if self.doctype is not None:
+            pieces.append('<!DOCTYPE %s>\n' % self.doctype)
+        for sibling in self._siblings():
+            if sibling is self.root:
+                self._render(sibling, translated, {XML_NAMESPACE: 'xml'}, {}, pieces)
+            else:
+                self._render_other(sibling, pieces)
+        return ''.join(pieces)
+
+    def _siblings(self):
+        yield from reversed(list(self.root.itersiblings(preceding=True)))
+        yield self.root
+        yield from self.root.itersiblings()
+
+    def _text(self, text, translated, pieces):
+        text = collapse_whitespace(text)
+        if not text:
+            return
+        if is_segment(text):
+            translated_text = next(translated, None)
+            if translated_text is not None:
+                text = translated_text
+        pieces.append(escape_text(text))
+
+    def _render_other(self, node, pieces):
+        if node.tag is etree.Comment:
+            # BeautifulSoup turns an empty comment into a single space, too.
+            pieces.append('<!--%s-->' % (collapse_whitespace(node.text or '') or ' '))
+        else:
+            pieces.append('<?%s %s?>' % (node.target, node.text or ''))
+
+    def _render(self, element, translated, prefixes, parent_nsmap, pieces):
+        if element.tag is etree.Comment or element.tag is etree.PI:
+            self._render_other(element, pieces)
+            self._text(element.tail, translated, pieces)
+            return
+        nsmap = element.nsmap
+        attributes = []
+        if nsmap != parent_nsmap:
+            prefixes = dict(prefixes)
+            for prefix, namespace in nsmap.items():
+                if parent_nsmap.get(prefix) != namespace:
+                    attributes.append(('xmlns:' + prefix if prefix else 'xmlns', namespace))
+                    prefixes[namespace] = prefix
+        name = self._name(element.tag, prefixes)
+        for key, value in element.attrib.items():
+            attributes.append((self._name(key, prefixes), value))
+        pieces.append('<' + name)
+        for key, value in sorted(attributes):
+            pieces.append(' %s=%s' % (key, quote_attribute(value)))
+        if element.text is None and len(element) == 0:
+            pieces.append('/>')
+        else:
+            pieces.append('>')
+            self._text(element.text, translated, pieces)
+            for child in element:
+                self._render(child, translated, prefixes, nsmap, pieces)
+            pieces.append('</%s>' % name)
+        if element is not self.root:
+            self._text(element.tail, translated, pieces)
+
+    def _name(self, tag, prefixes):
+        if tag[0] != '{':
+            return tag
+        namespace, local = tag[1:].split('}', 1)
+        prefix = prefixes.get(namespace)
+        return prefix + ':' + local if prefix else local
@@ -0,0 +1,169 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+METRIC_PREFIX = 'epub_translator'
+
+
+class StageTimers():
+    """Wall and CPU time spent in each stage of a run.
+
+    CPU time is the time of the thread running the stage, so work the stage
+    hands to other threads or processes only shows in its wall time. Timers
+    are shared by every book of a batch and every edition of a book, and
+    stages running at the same time each count their own time.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages = {}
+
+    @contextmanager
+    def measure(self, stage):
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - wall, time.thread_time() - cpu)
+
+    def add(self, stage, wall_seconds, cpu_seconds, calls=1):
+        with self.lock:
+            record = self.stages.setdefault(stage, {'calls': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0})
+            record['calls'] += calls
+            record['wall_seconds'] += wall_seconds
+            record['cpu_seconds'] += cpu_seconds
+
+    def snapshot(self):
+        with self.lock:
+            return {stage: dict(record) for stage, record in self.stages.items()}
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{%s}' % ','.join('%s="%s"' % (key, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                             for key, value in labels.items())
+
+
+class PrometheusWriter():
+    def __init__(self):
+        self.lines = []
+
+    def metric(self, name, kind, help_text, samples):
+        """`samples` is a list of (suffix, labels, value); None values are skipped."""
+        samples = [sample for sample in samples if sample[2] is not None]
+        if not samples:
+            return
+        name = f'{METRIC_PREFIX}_{name}'
+        self.lines.append(f'# HELP {name} {help_text}')
+        self.lines.append(f'# TYPE {name} {kind}')
+        for suffix, labels, value in samples:
+            self.lines.append(f'{name}{suffix}{format_labels(labels)} {float(value):g}')
+
+    def text(self):
+        return '\n'.join(self.lines) + '\n'
+
+
+def format_prometheus(report):
+    """Render a stats report as Prometheus text exposition format."""
+    writer = PrometheusWriter()
+    stages = report.get('stages', {})
+    writer.metric('stage_calls_total', 'counter', 'Times each stage ran.',
+                  [('', {'stage': stage}, record['calls']) for stage, record in stages.items()])
+    writer.metric('stage_wall_seconds_total', 'counter', 'Wall time spent in each stage.',
+                  [('', {'stage': stage}, record['wall_seconds']) for stage, record in stages.items()])
+    writer.metric('stage_cpu_seconds_total', 'counter', 'CPU time of the thread running each stage.',
+                  [('', {'stage': stage}, record['cpu_seconds']) for stage, record in stages.items()])
+
+    latency = report.get('requests', {}).get('latency')
+    if latency:
+        samples = []
+        bounds = ['%g' % bound for bound in latency['buckets']] + ['+Inf']
+        for outcome, record in latency['outcomes'].items():
+            cumulative = 0
+            for bound, count in zip(bounds, record['counts']):
+                cumulative += count
+                samples.append(('_bucket', {'outcome': outcome, 'le': bound}, cumulative))
+            samples.append(('_sum', {'outcome': outcome}, record['sum']))
+            samples.append(('_count', {'outcome': outcome}, record['count']))
+        writer.metric('request_latency_seconds', 'histogram',
+                      'Latency of every translation request attempt, by outcome.', samples)
+
+    segments = report.get('segments', {})
+    writer.metric('segments_total', 'counter', 'Text segments found in the HTML files.',
+                  [('', {}, segments.get('segments'))])
+    writer.metric('unique_segments_total', 'counter', 'Distinct text segments sent for translation.',
+                  [('', {}, segments.get('unique_segments'))])
+    packer = report.get('packer', {})
+    writer.metric('chunks_total', 'counter', 'Packed chunks of segments translated.',
+                  [('', {}, packer.get('chunks'))])
+    writer.metric('misaligned_chunks_total', 'counter', 'Chunks re-translated segment by segment.',
+                  [('', {}, packer.get('misaligned_chunks'))])
+
+    limiter = report.get('rate_limiter', {})
+    writer.metric('rate_limiter_requests_total', 'counter', 'Requests let through the rate limiter.',
+                  [('', {}, limiter.get('requests'))])
+    writer.metric('rate_limiter_throttled_total', 'counter', 'Throttled, failed or empty responses.',
+                  [('', {}, limiter.get('throttled'))])
+    writer.metric('rate_limiter_retries_total', 'counter', 'Retried requests.',
+                  [('', {}, limiter.get('retries'))])
+    writer.metric('rate_limiter_wait_seconds_total', 'counter', 'Time spent waiting for the rate limiter.',
+                  [('', {}, limiter.get('wait_time'))])
+    writer.metric('rate_limiter_rate', 'gauge', 'Current request rate per second.',
+                  [('', {}, limiter.get('rate'))])
+
+    connections = report.get('connections', {})
+    writer.metric('connections_opened_total', 'counter', 'HTTP connections opened.',
+                  [('', {}, connections.get('connections_opened'))])
+    writer.metric('connections_reused_total', 'counter', 'Requests sent over an open connection.',
+                  [('', {}, connections.get('connections_reused'))])
+
+    chunk_sizes = report.get('chunk_sizes')
+    if chunk_sizes:
+        hosts = chunk_sizes['hosts']
+        writer.metric('chunk_size_chars', 'gauge', 'Current adaptive chunk size of each host.',
+                      [('', {'host': host}, stats['size']) for host, stats in hosts.items()])
+        writer.metric('chunk_size_slow_total', 'counter', 'Requests of each host slower than the target latency.',
+                      [('', {'host': host}, stats['slow']) for host, stats in hosts.items()])
+        chosen = chunk_sizes['chosen']
+        writer.metric('chunk_size_chosen_chars', 'gauge', 'Chunk sizes used to pack the requests.',
+                      [('', {'stat': stat}, chosen[stat]) for stat in ('min', 'mean', 'max')])
+
+    hedging = report.get('hedging')
+    if hedging:
+        writer.metric('hedged_requests_total', 'counter', 'Requests sent a second time after the hedge delay.',
+                      [('', {}, hedging['hedged'])])
+        writer.metric('hedge_results_total', 'counter', 'Hedged requests by the copy that answered first.',
+                      [('', {'winner': 'hedge'}, hedging['hedge_wins']),
+                       ('', {'winner': 'primary'}, hedging['primary_wins']),
+                       ('', {'winner': 'none'}, hedging['both_failed'])])
+        writer.metric('hedges_over_budget_total', 'counter', 'Hedges not sent because the budget was spent.',
+                      [('', {}, hedging['over_budget'])])
+
+    cache = report.get('cache')
+    if cache:
+        writer.metric('cache_hits_total', 'counter', 'Translation memory hits.', [('', {}, cache['hits'])])
+        writer.metric('cache_misses_total', 'counter', 'Translation memory misses.', [('', {}, cache['misses'])])
+
+    endpoints = report.get('endpoints') or {}
+    writer.metric('endpoint_requests_total', 'counter', 'Requests sent to each host.',
+                  [('', {'host': host}, stats['requests']) for host, stats in endpoints.items()])
+    writer.metric('endpoint_errors_total', 'counter', 'Failed requests of each host.',
+                  [('', {'host': host}, stats['errors']) for host, stats in endpoints.items()])
+    proxies = report.get('proxies') or {}
+    writer.metric('proxy_requests_total', 'counter', 'Requests sent through each proxy.',
+                  [('', {'proxy': proxy}, stats['requests']) for proxy, stats in proxies.items()])
+    writer.metric('proxy_quarantines_total', 'counter', 'Times each proxy was quarantined.',
+                  [('', {'proxy': proxy}, stats['quarantines']) for proxy, stats in proxies.items()])
+    return writer.text()
+
+
+def write_report(report, path, format='json'):
+    with open(path, 'w', encoding='utf-8') as f:
+        if format == 'prometheus':
+            f.write(format_prometheus(report))
+        else:
+            json.dump(report, f, indent=2)
+            f.write('\n')
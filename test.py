@@ -4,7 +4,6 @@ import re
 import shutil
 import sys
 import zipfile
-import time
 from multiprocessing.dummy import Pool as ThreadPool
 from pathlib import Path
 
@@ -271,7 +270,6 @@ class TranslatorEngine():
 
     def translate_text(self, text):
         translator = google_translator(timeout=15)
-        time.sleep(1)  # Add a delay between requests   
         if type(text) is not str:
             translate_text = ''
             for substr in text:
@@ -0,0 +1,47 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+# The local stand-in servers of the benchmarks.
+BENCHMARKS = os.path.join(ROOT, 'benchmarks')
+if BENCHMARKS not in sys.path:
+    sys.path.append(BENCHMARKS)
+
+
+@pytest.fixture(scope='session')
+def engine_module():
+    """epub-translator.py, whose file name is not a valid module name."""
+    if 'epub_translator' in sys.modules:
+        return sys.modules['epub_translator']
+    spec = importlib.util.spec_from_file_location('epub_translator', os.path.join(ROOT, 'epub-translator.py'))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['epub_translator'] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+class FakeTranslator():
+    """Stands in for google_translator: upper-cases every text it is sent."""
+
+    def __init__(self):
+        self.sent = []
+
+    def translate_batch(self, texts, lang_tgt='auto', lang_src='auto', **kwargs):
+        self.sent += texts
+        for text in texts:
+            assert len(text) < 5000, 'google_translator refuses texts of 5000 characters or more'
+        return [text.upper() for text in texts]
+
+
+@pytest.fixture
+def engine(engine_module):
+    engine = engine_module.TranslatorEngine()
+    engine.translator = FakeTranslator()
+    engine.chunk_sizer = None
+    engine.concurrency = 2
+    return engine
@@ -0,0 +1,15 @@
+from google_trans_new import group_batches
+
+
+def test_group_batches_limits_characters_and_rpcs():
+    assert group_batches(['aaaa', 'bb', 'cc', 'd'], max_chars=6) == [['aaaa', 'bb'], ['cc', 'd']]
+    assert group_batches(['a'] * 5, max_rpcs=2) == [['a', 'a'], ['a', 'a'], ['a']]
+
+
+def test_group_batches_gives_oversize_items_their_own_batch():
+    assert group_batches(['a', 'b' * 10, 'c'], max_chars=5) == [['a'], ['b' * 10], ['c']]
+
+
+def test_group_batches_measures_items_with_size():
+    items = [(0, 'aaa'), (1, 'bbb'), (2, 'c')]
+    assert group_batches(items, max_chars=4, size=lambda item: len(item[1])) == [[(0, 'aaa')], [(1, 'bbb'), (2, 'c')]]
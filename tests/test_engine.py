@@ -0,0 +1,110 @@
+import os
+import threading
+import time
+
+import pytest
+
+
+def test_oversize_segment_is_split_below_the_request_limit(engine):
+    sentence = 'The young master drew his sword and the elders fell silent. '
+    long_text = '  ' + sentence * 110 + ' \n'
+    assert len(long_text.strip()) > 6000
+
+    translated = engine.translate_tag([long_text, 'short text'])
+
+    assert translated == [long_text.upper(), 'SHORT TEXT']
+    assert all(len(text) < 5000 for text in engine.translator.sent)
+    assert not any(text.startswith('Warning') for text in translated)
+
+
+def test_empty_batch_slot_is_translated_segment_by_segment(engine):
+    translator = engine.translator
+    translate_batch = translator.translate_batch
+
+    def drop_packed_chunks(texts, lang_tgt='auto', lang_src='auto', **kwargs):
+        # An empty batchexecute slot comes back as None.
+        return [None if '[#' in text else translated
+                for text, translated in zip(texts, translate_batch(texts, lang_tgt, lang_src))]
+
+    translator.translate_batch = drop_packed_chunks
+    assert engine.translate_tag(['first', 'second', 'third']) == ['FIRST', 'SECOND', 'THIRD']
+    assert engine.packer_stats['misaligned_chunks'] == 1
+
+
+def test_segment_left_untranslated_fails_the_book(engine, engine_module):
+    engine.translator.translate_batch = lambda texts, lang_tgt='auto', lang_src='auto', **kwargs: [None] * len(texts)
+    with pytest.raises(engine_module.google_new_transError):
+        engine.translate_tag(['first', 'second'])
+
+
+def test_folder_scan_leaves_out_translated_books(engine_module, tmp_path):
+    names = ['book', engine_module.translated_name('book'), engine_module.translated_name('book', 'vi'),
+             engine_module.translated_name('book', 'zh-cn'), 'notes_translated_draft']
+    for name in names:
+        (tmp_path / f'{name}.epub').write_bytes(b'')
+
+    found = [os.path.basename(path) for path in engine_module.find_epub_files(str(tmp_path))]
+    assert found == ['book.epub', 'notes_translated_draft.epub']
+
+
+class RecordingJournal():
+    def __init__(self):
+        self.translations = {}
+
+    def get_many(self, texts):
+        return {}
+
+    def put_many(self, items):
+        self.translations.update(items)
+
+
+def test_failed_book_journals_the_requests_in_flight(engine, capsys):
+    def translate_batch(texts, lang_tgt='auto', lang_src='auto', **kwargs):
+        if texts == ['boom']:
+            raise RuntimeError('throttled for good')
+        time.sleep(0.2)
+        return [text.upper() for text in texts]
+
+    engine.translator.translate_batch = translate_batch
+    engine.journal = RecordingJournal()
+    # One segment per request, so they run side by side.
+    engine.max_trans_words = engine.max_batch_chars = 10
+    documents = [('chapter.xhtml', None, None, ['boom', 'alpha', 'beta', 'gamma', 'delta'])]
+
+    with pytest.raises(RuntimeError):
+        engine.multithreads_html_translate(documents)
+
+    # 'alpha' was sent along with 'boom'; later segments may have been picked up before the failure.
+    assert engine.journal.translations['alpha'] == 'ALPHA'
+    assert all(translated == text.upper() for text, translated in engine.journal.translations.items())
+    assert capsys.readouterr().out.count('FAIL') == 1
+
+
+def test_editions_share_the_concurrency_cap(engine, tmp_path):
+    lock = threading.Lock()
+    counts = {'in_flight': 0, 'peak': 0}
+
+    def translate_batch(texts, lang_tgt='auto', lang_src='auto', **kwargs):
+        with lock:
+            counts['in_flight'] += 1
+            counts['peak'] = max(counts['peak'], counts['in_flight'])
+        time.sleep(0.05)
+        with lock:
+            counts['in_flight'] -= 1
+        return [text.upper() for text in texts]
+
+    engine.translator.translate_batch = translate_batch
+    engine.resume = False
+    engine.get_epub_file_info(str(tmp_path / 'book.epub'))
+    (tmp_path / 'book.epub').write_bytes(b'')
+    engine.dest_langs = ['vi', 'en', 'es']
+    engine.write_documents = lambda documents, unique_text, translated_text: None
+    # One segment per request, so there is plenty to run side by side.
+    engine.max_trans_words = engine.max_batch_chars = 10
+    documents = [('chapter.xhtml', None, None, ['alpha', 'beta', 'gamma', 'delta', 'epsilon', 'zeta'])]
+
+    engine.translate_editions(documents)
+    engine.close_journal(True)
+
+    assert counts['peak'] <= engine.concurrency
+    assert len({id(edition.scheduler) for edition in engine.editions}) == 1
@@ -0,0 +1,49 @@
+import zipfile
+
+MEMBERS = {
+    'mimetype': b'application/epub+zip',
+    'OEBPS/Text/0001.xhtml': b'<html><body><p>Hello</p></body></html>' * 50,
+    'OEBPS/Images/cover.jpg': bytes(range(256)) * 8,
+}
+
+
+def make_epub(path):
+    with zipfile.ZipFile(path, 'w') as archive:
+        for name, data in MEMBERS.items():
+            compress_type = zipfile.ZIP_STORED if name == 'mimetype' else zipfile.ZIP_DEFLATED
+            archive.writestr(name, data, compress_type=compress_type)
+
+
+def copy_members(engine_module, source_path, target_path):
+    with zipfile.ZipFile(source_path) as source, zipfile.ZipFile(target_path, 'w') as archive:
+        for info in source.infolist():
+            engine_module.copy_zip_member(source, archive, info)
+
+
+def read_members(path):
+    with zipfile.ZipFile(path) as archive:
+        assert archive.testzip() is None
+        return {info.filename: (archive.read(info), info.compress_type) for info in archive.infolist()}
+
+
+def test_members_are_copied_verbatim(engine_module, tmp_path):
+    make_epub(tmp_path / 'book.epub')
+    copy_members(engine_module, tmp_path / 'book.epub', tmp_path / 'copy.epub')
+    assert read_members(tmp_path / 'copy.epub') == read_members(tmp_path / 'book.epub')
+
+
+def test_members_are_re_encoded_without_zipfile_internals(engine_module, tmp_path, monkeypatch):
+    def read_zip_member_raw(source, info):
+        raise AttributeError("'ZipFile' object has no attribute '_lock'")
+
+    monkeypatch.setattr(engine_module, 'read_zip_member_raw', read_zip_member_raw)
+    make_epub(tmp_path / 'book.epub')
+    copy_members(engine_module, tmp_path / 'book.epub', tmp_path / 'copy.epub')
+    assert read_members(tmp_path / 'copy.epub') == read_members(tmp_path / 'book.epub')
+
+
+def test_members_are_re_encoded_when_raw_copies_are_off(engine_module, tmp_path, monkeypatch):
+    monkeypatch.setattr(engine_module, 'RAW_ZIP_COPY', False)
+    make_epub(tmp_path / 'book.epub')
+    copy_members(engine_module, tmp_path / 'book.epub', tmp_path / 'copy.epub')
+    assert read_members(tmp_path / 'copy.epub') == read_members(tmp_path / 'book.epub')
@@ -0,0 +1,47 @@
+import threading
+import time
+
+from google_trans_new import ChunkSizer, EndpointPool, HedgePolicy, LatencyHistogram, RateLimiter, google_translator
+
+
+class FakeResponse():
+    status_code = 200
+    raw = None
+
+    def iter_content(self, chunk_size=1):
+        yield b''
+
+    def close(self):
+        pass
+
+
+def test_sync_hedge_records_the_slower_copy_as_cancelled():
+    latency = LatencyHistogram()
+    for _ in range(5):
+        latency.observe(0.01)
+    hedge = HedgePolicy(latency=latency, budget=1.0, min_samples=1)
+    chunk_sizer = ChunkSizer()
+    endpoints = EndpointPool(['com', 'de'])
+    translator = google_translator(endpoints=endpoints, latency=latency, chunk_sizer=chunk_sizer, hedge=hedge,
+                                   rate_limiter=RateLimiter(rate=1000, burst=1000))
+    calls = []
+    slow_done = threading.Event()
+
+    def post(freq, url=None, proxy=None):
+        calls.append(url)
+        if len(calls) == 1:
+            # The first copy stalls until long after the hedge answered.
+            time.sleep(0.5)
+            slow_done.set()
+        return FakeResponse()
+
+    translator._post = post
+    assert translator._request('f.req=', lambda envelopes: 'translated', 10) == 'translated'
+    assert hedge.stats()['hedge_wins'] == 1
+    assert slow_done.wait(2)
+    time.sleep(0.1)
+
+    assert len(calls) == 2
+    assert latency.count('cancelled') == 1
+    assert latency.count('ok') == 6
+    assert sum(host['requests'] for host in chunk_sizer.stats()['hosts'].values()) == 1
@@ -0,0 +1,54 @@
+import pytest
+
+from html_worker import parse_html, render_html
+from lxml_document import LxmlDocument
+
+HEAD = '<?xml version="1.0" encoding="utf-8"?>\n'
+XHTML = '<html xmlns="http://www.w3.org/1999/xhtml"><head><title>Chapter</title></head>\n<body>\n%s\n</body></html>'
+
+
+def page(body, head=HEAD):
+    return (head + XHTML % body).encode('utf-8')
+
+
+# The inputs the fallback to BeautifulSoup exists for, and the ones lxml
+# has to reproduce itself.
+CASES = {
+    'plain': page('<p class="txt">The elders fell <i>silent</i> &amp; waited.</p>'),
+    'cdata': page('<p>Before <![CDATA[x < y & z]]> after</p>'),
+    'comment and pi': page('<!-- end of chapter --><p>Text<?page 12?>more</p><!---->'),
+    'comment before root': ('<?xml version="1.0" encoding="utf-8"?>\n<!-- generated -->\n'
+                            + XHTML % '<p>Text</p>').encode('utf-8'),
+    'doctype with public id': page('<p>Text</p>', HEAD + '<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.1//EN" '
+                                   '"http://www.w3.org/TR/xhtml11/DTD/xhtml11.dtd">\n'),
+    'html5 doctype': page('<p>Text</p>', HEAD + '<!DOCTYPE html>\n'),
+    'namespaced svg': page('<div><svg xmlns="http://www.w3.org/2000/svg" '
+                           'xmlns:xlink="http://www.w3.org/1999/xlink" viewBox="0 0 10 10">'
+                           '<image xlink:href="cover.jpg" width="10"/><text x="1">Cover</text></svg></div>'),
+    'epub namespace': page('<aside xmlns:epub="http://www.idpf.org/2007/ops" epub:type="footnote">Note</aside>'),
+    'nbsp': page('<p>Left&nbsp;right</p><p>&#160;</p>'),
+    'nbsp with doctype': page('<p>Left&nbsp;right</p>', HEAD + '<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.1//EN" '
+                              '"http://www.w3.org/TR/xhtml11/DTD/xhtml11.dtd">\n'),
+    'crlf': page('<p>First line\nsecond line</p>\n<p>Third</p>\n').replace(b'\n', b'\r\n'),
+    'bom': b'\xef\xbb\xbf' + page('<p>Text</p>'),
+    'non utf-8 declaration': page('<p>Text</p>', '<?xml version="1.0" encoding="windows-1252"?>\n'),
+    'quotes in attributes': page('<p title="say &quot;hi&quot;" data-x="it\'s">Text</p>'),
+    'whitespace only': page('<p>  </p>\n\t\n<p>\n</p><br/>'),
+}
+
+
+@pytest.mark.parametrize('data', CASES.values(), ids=CASES.keys())
+def test_lxml_renders_like_beautifulsoup(data):
+    fast = parse_html(data, True)
+    slow = parse_html(data, False)
+
+    assert fast[2] == slow[2]
+    for translated_text in ([None] * len(slow[2]), [text.upper() for text in slow[2]], [None, '<&>']):
+        expected = render_html(*slow[:2], translated_text, keep_document=True)
+        assert render_html(*fast[:2], translated_text, keep_document=True) == expected
+
+
+def test_fast_path_takes_the_common_cases():
+    for name in ('plain', 'cdata', 'comment and pi', 'comment before root', 'doctype with public id',
+                 'html5 doctype', 'namespaced svg', 'epub namespace', 'crlf'):
+        assert isinstance(parse_html(CASES[name], True)[0], LxmlDocument), name
@@ -0,0 +1,106 @@
+import asyncio
+import socket
+import time
+
+import pytest
+
+import google_trans_new
+from google_trans_new import (RPC_PATH, ChunkSizer, LatencyHistogram, ProxyPool, RateLimiter,
+                              async_google_translator, google_translator)
+from mock_server import MockProxyServer, MockTranslateServer, pseudo_translate
+
+TEXTS = ['one', 'two', 'three', 'four', 'five', 'six']
+QUARANTINE = 1.0
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(google_trans_new, 'backoff_delay', lambda attempt: 0)
+
+
+@pytest.fixture
+def endpoint():
+    server = MockTranslateServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def proxies():
+    servers = [MockProxyServer().start(), MockProxyServer().start()]
+    yield servers
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture
+def dead_port():
+    """A local port nothing listens on."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def translate(client, proxy_pool, endpoint, texts):
+    options = dict(proxy_pool=proxy_pool, rate_limiter=RateLimiter(rate=1000, burst=1000),
+                   latency=LatencyHistogram(), chunk_sizer=ChunkSizer())
+    if client == 'sync':
+        translator = google_translator(**options)
+        translator.url = endpoint.url_base + RPC_PATH
+        return [translator.translate(text, 'vi').strip() for text in texts]
+
+    async def run():
+        async with async_google_translator(**options) as translator:
+            translator.url = endpoint.url_base + RPC_PATH
+            return [(await translator.translate(text, 'vi')).strip() for text in texts]
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize('client', ['sync', 'async'])
+def test_requests_rotate_round_robin(client, endpoint, proxies):
+    pool = ProxyPool([proxy.url_base for proxy in proxies])
+
+    assert translate(client, pool, endpoint, TEXTS) == [pseudo_translate(text) for text in TEXTS]
+
+    assert [proxy.stats()['requests'] for proxy in proxies] == [3, 3]
+    assert endpoint.stats()['requests'] == 6
+    stats = pool.stats()
+    for proxy in proxies:
+        assert stats[proxy.url_base]['requests'] == stats[proxy.url_base]['successes'] == 3
+        assert stats[proxy.url_base]['quarantines'] == 0
+    # Each client keeps its connection to each proxy alive.
+    assert [proxy.stats()['connections'] for proxy in proxies] == [1, 1]
+    if client == 'sync':
+        assert [stats[proxy.url_base]['connections_opened'] for proxy in proxies] == [1, 1]
+    pool.close()
+
+
+@pytest.mark.parametrize('client', ['sync', 'async'])
+def test_dead_proxy_is_quarantined_then_recovers(client, endpoint, proxies, dead_port):
+    live = proxies[0]
+    dead_url = 'http://127.0.0.1:%d' % dead_port
+    pool = ProxyPool([dead_url, live.url_base], quarantine=QUARANTINE)
+
+    # The first request goes to the dead proxy and is retried through the live one.
+    assert translate(client, pool, endpoint, TEXTS) == [pseudo_translate(text) for text in TEXTS]
+
+    stats = pool.stats()
+    assert stats[dead_url]['requests'] == stats[dead_url]['unreachable'] == 1
+    assert stats[dead_url]['quarantines'] == 1
+    assert stats[dead_url]['quarantined']
+    assert stats[live.url_base]['successes'] == live.stats()['requests'] == 6
+
+    revived = MockProxyServer(dead_port).start()
+    try:
+        time.sleep(QUARANTINE)
+        assert not pool.stats()[dead_url]['quarantined']
+        translate(client, pool, endpoint, TEXTS)
+    finally:
+        revived.stop()
+
+    stats = pool.stats()
+    assert stats[dead_url]['successes'] == revived.stats()['requests'] == 3
+    assert stats[live.url_base]['successes'] == 9
+    assert stats[dead_url]['quarantines'] == 1
+    pool.close()
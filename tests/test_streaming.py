@@ -0,0 +1,92 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from google_trans_new import (RPC_PATH, XSSI_PREFIX, BatchExecuteDecoder, RateLimiter, async_google_translator,
+                              google_translator)
+
+PAUSE = 0.5
+
+
+def frame(rpc_tag):
+    frame = json.dumps([['wrb.fr', 'MkEWBc', '[]', None, None, None, rpc_tag]])
+    return '%d\n%s\n' % (len(frame), frame)
+
+
+class SlowBodyHandler(BaseHTTPRequestHandler):
+    """Sends the first frame of the response, then the second one after a pause."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        head = (XSSI_PREFIX + '\n\n' + frame('1')).encode('utf-8')
+        tail = frame('2').encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(head) + len(tail)))
+        self.end_headers()
+        self.wfile.write(head)
+        self.wfile.flush()
+        time.sleep(PAUSE)
+        self.wfile.write(tail)
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SlowBodyHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield 'http://127.0.0.1:%d%s' % (server.server_address[1], RPC_PATH)
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def arrivals(monkeypatch):
+    """(rpc tag, time) of every envelope, when the decoder got it."""
+    arrivals = []
+    feed = BatchExecuteDecoder.feed
+
+    def record_feed(self, data, final=False):
+        envelopes = feed(self, data, final)
+        arrivals.extend((envelope[-1], time.monotonic()) for envelope in envelopes)
+        return envelopes
+
+    monkeypatch.setattr(BatchExecuteDecoder, 'feed', record_feed)
+    return arrivals
+
+
+def check_streamed(arrivals, started):
+    assert [tag for tag, _ in arrivals] == ['1', '2']
+    # The first frame was decoded well before the body was complete.
+    assert arrivals[0][1] - started < PAUSE / 2
+    assert arrivals[1][1] - started >= PAUSE
+
+
+def decode_tags(envelopes):
+    return [envelope[-1] for envelope in envelopes]
+
+
+def test_sync_responses_are_decoded_as_they_arrive(server, arrivals):
+    translator = google_translator(rate_limiter=RateLimiter(rate=100))
+    translator.url = server
+    started = time.monotonic()
+    assert translator._request('f.req=', decode_tags) == ['1', '2']
+    check_streamed(arrivals, started)
+
+
+def test_async_responses_are_decoded_as_they_arrive(server, arrivals):
+    async def request():
+        async with async_google_translator(rate_limiter=RateLimiter(rate=100)) as translator:
+            translator.url = server
+            return await translator._request('f.req=', decode_tags)
+
+    started = time.monotonic()
+    assert asyncio.run(request()) == ['1', '2']
+    check_streamed(arrivals, started)
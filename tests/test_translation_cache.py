@@ -0,0 +1,37 @@
+from google_trans_new import google_translator
+from throughput_benchmark import make_epub
+from translation_cache import TranslationMemory
+
+
+def test_put_many_skips_missing_translations(tmp_path):
+    cache = TranslationMemory(str(tmp_path))
+    cache.put_many([('hello', 'xin chào'), ('world', None)], 'auto', 'vi')
+    assert cache.get_many(['hello', 'world'], 'auto', 'vi') == {'hello': 'xin chào'}
+    cache.close()
+
+
+def test_empty_batch_responses_are_not_cached(tmp_path):
+    cache = TranslationMemory(str(tmp_path))
+    translator = google_translator(cache=cache)
+    # Every request comes back as an empty page.
+    translator._translate_rpcs = lambda texts, lang_tgt, lang_src: {}
+    translator.translate = lambda text, lang_tgt='auto', lang_src='auto', pronounce=False: None
+
+    assert translator.translate_batch(['hello', 'world'], 'vi') == [None, None]
+    assert cache.stats()['entries'] == 0
+    cache.close()
+
+
+def test_engine_closes_the_cache_after_the_book(engine, tmp_path):
+    make_epub(tmp_path / 'book.epub', 2, 5)
+    engine.resume = False
+    engine.cache = TranslationMemory(str(tmp_path / 'cache'))
+
+    assert engine.start(str(tmp_path / 'book.epub'))
+
+    assert engine.cache.connection is None
+    entries = engine.stats_report()['cache']['entries']
+    assert entries > 0
+    reopened = TranslationMemory(str(tmp_path / 'cache'))
+    assert reopened.stats()['entries'] == entries
+    reopened.close()
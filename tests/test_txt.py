@@ -0,0 +1,24 @@
+import txt
+
+
+class UpperTranslator():
+    def __init__(self, timeout=None):
+        pass
+
+    def translate_batch(self, texts, lang_tgt='auto', lang_src='auto', **kwargs):
+        return [text.upper() for text in texts]
+
+
+def test_bad_byte_past_the_first_megabyte_falls_back(monkeypatch, tmp_path):
+    monkeypatch.setattr(txt, 'google_translator', UpperTranslator)
+    # Plain ASCII for well over a megabyte, then a latin-1 byte that is
+    # neither UTF-8 nor the lead byte of a gbk character.
+    data = b'The elders fell silent.\n' * 50000 + 'Caf\xe9 au lait.\n'.encode('latin1')
+    assert data.index(b'\xe9') > 1024 * 1024
+    source = tmp_path / 'book.txt'
+    source.write_bytes(data)
+    output = tmp_path / 'book_translated.txt'
+
+    txt.translate_file(str(source), str(output), 'vi', concurrency=2)
+
+    assert output.read_text(encoding='utf-8') == data.decode('latin1').upper()
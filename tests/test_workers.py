@@ -0,0 +1,43 @@
+import zipfile
+
+import pytest
+
+from throughput_benchmark import make_epub
+
+# Goes through BeautifulSoup rather than lxml, in the workers too.
+BOM_CHAPTER = b'\xef\xbb\xbf<?xml version="1.0" encoding="utf-8"?>\n' \
+              b'<html xmlns="http://www.w3.org/1999/xhtml"><body><p>Fallback chapter</p></body></html>'
+
+
+def translate_book(engine_module, translator_type, path, workers, in_memory):
+    engine = engine_module.TranslatorEngine()
+    engine.translator = translator_type()
+    engine.chunk_sizer = None
+    engine.concurrency = 2
+    engine.resume = False
+    engine.workers = workers
+    engine.in_memory = in_memory
+    try:
+        assert engine.start(str(path))
+        assert (engine.process_pool is not None) == (workers > 0)
+    finally:
+        engine.shutdown_workers()
+    output = path.parent / (engine_module.translated_name('book') + '.epub')
+    with zipfile.ZipFile(output) as archive:
+        return {name: archive.read(name) for name in archive.namelist() if name.endswith('.xhtml')}
+
+
+@pytest.mark.parametrize('in_memory', [False, True], ids=['extracted', 'in memory'])
+def test_worker_processes_write_the_same_html(engine, engine_module, tmp_path, in_memory):
+    outputs = []
+    for workers in (0, 2):
+        path = tmp_path / str(workers) / 'book.epub'
+        path.parent.mkdir()
+        make_epub(path, 6, 20)
+        with zipfile.ZipFile(path, 'a') as archive:
+            archive.writestr('OEBPS/Text/fallback.xhtml', BOM_CHAPTER)
+        outputs.append(translate_book(engine_module, type(engine.translator), path, workers, in_memory))
+
+    assert len(outputs[0]) == 7
+    assert b'FALLBACK CHAPTER' in outputs[0]['OEBPS/Text/fallback.xhtml']
+    assert outputs[1] == outputs[0]
@@ -0,0 +1,33 @@
+import re
+
+# Where a text may be cut, best first: after a blank line, a line break, the
+# end of a sentence, any whitespace.
+SPLIT_PATTERNS = [
+    re.compile(r'\n[^\S\n]*\n\s*'),
+    re.compile(r'\n\s*'),
+    re.compile(r'[.!?…]+["\'”’)\]]*\s+|[。！？]+[」』”’）]*\s*'),
+    re.compile(r'\s+'),
+]
+
+
+def split_point(text, limit):
+    window = text[:limit]
+    for pattern in SPLIT_PATTERNS:
+        cut = 0
+        for match in pattern.finditer(window):
+            cut = match.end()
+        if cut > 0:
+            return cut
+    return limit
+
+
+def split_text(text, limit):
+    """Cut `text` into pieces of at most `limit` characters, each ending on
+    the best boundary available: a paragraph, then a line, a sentence or a word."""
+    pieces = []
+    while len(text) > limit:
+        cut = split_point(text, limit)
+        pieces.append(text[:cut])
+        text = text[cut:]
+    pieces.append(text)
+    return pieces
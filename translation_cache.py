@@ -0,0 +1,125 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_SIZE = 256 * 1024 * 1024
+CACHE_FILE_NAME = 'translation_memory.sqlite3'
+
+
+class TranslationMemory():
+    """Persistent translation memory keyed by (source text, source lang, dest lang).
+
+    Entries live in a SQLite database inside `cache_dir`. When the stored
+    translations grow past `max_size` bytes, the least recently used entries
+    are evicted.
+    """
+
+    def __init__(self, cache_dir, max_size=DEFAULT_CACHE_SIZE):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, CACHE_FILE_NAME)
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS translations ('
+            'key TEXT PRIMARY KEY, translation TEXT NOT NULL, '
+            'size INTEGER NOT NULL, last_used REAL NOT NULL)')
+        self.connection.execute(
+            'CREATE INDEX IF NOT EXISTS translations_last_used ON translations (last_used)')
+        self.connection.commit()
+        self.size = self.connection.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM translations').fetchone()[0]
+        self.entries = self._count_entries()
+
+    @staticmethod
+    def make_key(text, lang_src, lang_tgt):
+        return hashlib.sha1('\0'.join((lang_src, lang_tgt, text)).encode('utf-8')).hexdigest()
+
+    def get(self, text, lang_src, lang_tgt):
+        return self.get_many([text], lang_src, lang_tgt).get(text)
+
+    def get_many(self, texts, lang_src, lang_tgt):
+        keys = {self.make_key(text, lang_src, lang_tgt): text for text in texts}
+        found = {}
+        with self.lock:
+            key_list = list(keys)
+            for start in range(0, len(key_list), 500):
+                chunk = key_list[start:start + 500]
+                rows = self.connection.execute(
+                    'SELECT key, translation FROM translations WHERE key IN (%s)'
+                    % ','.join('?' * len(chunk)), chunk).fetchall()
+                for key, translation in rows:
+                    found[keys[key]] = translation
+                self.connection.executemany(
+                    'UPDATE translations SET last_used = ? WHERE key = ?',
+                    [(time.time(), key) for key, _ in rows])
+            self.connection.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put(self, text, lang_src, lang_tgt, translation):
+        self.put_many([(text, translation)], lang_src, lang_tgt)
+
+    def put_many(self, items, lang_src, lang_tgt):
+        rows = [(self.make_key(text, lang_src, lang_tgt), translation,
+                 len(translation.encode('utf-8')), time.time())
+                for text, translation in items if translation is not None]
+        rows = list({row[0]: row for row in rows}.values())
+        if not rows:
+            return
+        with self.lock:
+            for key, _, size, _ in rows:
+                old = self.connection.execute(
+                    'SELECT size FROM translations WHERE key = ?', (key,)).fetchone()
+                self.size += size - (old[0] if old else 0)
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO translations (key, translation, size, last_used) '
+                'VALUES (?, ?, ?, ?)', rows)
+            if self.size > self.max_size:
+                self._evict()
+            self.connection.commit()
+
+    def _evict(self):
+        # Trim to 90% of the budget so eviction does not run on every insert.
+        target = self.max_size * 0.9
+        cursor = self.connection.execute(
+            'SELECT key, size FROM translations ORDER BY last_used')
+        evicted = []
+        for key, size in cursor:
+            if self.size <= target:
+                break
+            evicted.append((key,))
+            self.size -= size
+        cursor.close()
+        self.connection.executemany('DELETE FROM translations WHERE key = ?', evicted)
+
+    def _count_entries(self):
+        return self.connection.execute('SELECT COUNT(*) FROM translations').fetchone()[0]
+
+    def stats(self):
+        # Still available once closed, as they were at that point.
+        with self.lock:
+            if self.connection is not None:
+                self.entries = self._count_entries()
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': self.entries,
+                'size': self.size,
+                'max_size': self.max_size,
+            }
+
+    def close(self):
+        with self.lock:
+            if self.connection is None:
+                return
+            self.entries = self._count_entries()
+            self.connection.close()
+            self.connection = None
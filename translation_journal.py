@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+import threading
+
+JOURNAL_VERSION = 2
+
+
+def file_digest(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class TranslationJournal():
+    """Append-only log of the work done on one book, used to resume a run.
+
+    Every translated segment and every HTML file written is appended as a
+    JSON line and flushed to disk right away. The first line identifies the
+    source epub and the destination language; a journal written for another
+    book or language is discarded. A torn last line left by a crash is
+    ignored when the journal is loaded.
+    """
+
+    def __init__(self, path, fingerprint, resume=True):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.translations = {}
+        self.files = {}
+        self.lock = threading.Lock()
+        if resume and os.path.isfile(path):
+            self._load()
+        mode = 'w' if self.is_empty else 'a'
+        self.file = open(path, mode, encoding='utf-8')
+        if mode == 'w':
+            self._append({'version': JOURNAL_VERSION, 'book': fingerprint})
+
+    @staticmethod
+    def make_fingerprint(epub_path, dest_lang):
+        return {'epub': file_digest(epub_path), 'lang': dest_lang}
+
+    def _load(self):
+        with open(self.path, encoding='utf-8') as f:
+            lines = f.read().split('\n')
+        try:
+            header = json.loads(lines[0])
+        except ValueError:
+            return
+        if header != {'version': JOURNAL_VERSION, 'book': self.fingerprint}:
+            return
+        for line in lines[1:]:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if 'text' in record:
+                self.translations[record['text']] = record['translation']
+            elif 'file' in record:
+                self.files[record['file']] = record['sha1']
+
+    def _append(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def _sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    @property
+    def is_empty(self):
+        return not self.translations and not self.files
+
+    def get_many(self, texts):
+        with self.lock:
+            return {text: self.translations[text] for text in texts if text in self.translations}
+
+    def put_many(self, items):
+        with self.lock:
+            for text, translation in items:
+                if translation is not None and self.translations.get(text) != translation:
+                    self.translations[text] = translation
+                    self._append({'text': text, 'translation': translation})
+            self._sync()
+
+    def commit_file(self, name, sha1):
+        with self.lock:
+            self.files[name] = sha1
+            self._append({'file': name, 'sha1': sha1})
+            self._sync()
+
+    def is_committed(self, name, path):
+        """True when `path` still holds the translated `name` written by an earlier run."""
+        with self.lock:
+            sha1 = self.files.get(name)
+        return sha1 is not None and os.path.isfile(path) and file_digest(path) == sha1
+
+    def close(self):
+        with self.lock:
+            if not self.file.closed:
+                self.file.close()
+
+    def discard(self):
+        self.close()
+        if os.path.isfile(self.path):
+            os.remove(self.path)
@@ -1,72 +1,161 @@
 import argparse
-import time
-from google_trans_new import google_translator
+import codecs
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from google_trans_new import BATCH_MAX_CHARS, google_translator
+from text_split import split_point
 from tqdm import tqdm
 import chardet
 
+# google_translator refuses texts of 5000 characters or more.
+MAX_CHUNK_CHARS = 4999
+DEFAULT_CHUNK_CHARS = 4500
+READ_BLOCK_SIZE = 64 * 1024
+
 def detect_encoding(file_path):
     with open(file_path, 'rb') as f:
         raw_data = f.read(10000)  # Read the first 10000 bytes
         result = chardet.detect(raw_data)
         return result['encoding']
 
-def translate_text(text, translator, retries=3):
-    for attempt in range(retries):
-        try:
-            return translator.translate(text)
-        except Exception as e:
-            print(f"Attempt {attempt+1} failed: {e}")
-            time.sleep(5)  # Wait before retrying
-    raise Exception("Failed to connect after several attempts")
+def translate_chunks(chunks, translator, lang_tgt):
+    # google_translator rate limits and retries throttled requests itself.
+    # Several chunks share one request; only their text is sent, the
+    # surrounding whitespace is kept from the source.
+    stripped = [chunk.strip() for chunk in chunks]
+    try:
+        translated = translator.translate_batch(stripped, lang_tgt)
+    except Exception as e:
+        raise Exception(f"Failed to connect after several attempts: {e}")
+    results = []
+    for chunk, text, translated_text in zip(chunks, stripped, translated):
+        if not text:
+            results.append(chunk)
+            continue
+        if translated_text is None:
+            raise Exception(f"Failed to translate the text starting with: {text[:50]!r}")
+        start = chunk.index(text)
+        results.append(chunk[:start] + translated_text.strip() + chunk[start + len(text):])
+    return ''.join(results)
 
-def read_file_binary(file_path):
-    with open(file_path, 'rb') as f:
-        return f.read()
+def check_encoding(f, encoding):
+    """Decode a whole binary file one block at a time, raising
+    UnicodeDecodeError on the first byte that does not fit."""
+    f.seek(0)
+    decoder = codecs.getincrementaldecoder(encoding)()
+    while True:
+        block = f.read(READ_BLOCK_SIZE)
+        decoder.decode(block, final=not block)
+        if not block:
+            return
 
-def decode_text(binary_data, encodings):
+def pick_encoding(f, encodings):
+    # The whole file is checked before anything is written, so a bad byte
+    # far into it falls back to the next encoding instead of failing halfway.
     for encoding in encodings:
         try:
-            return binary_data.decode(encoding)
+            check_encoding(f, encoding)
+            return encoding
         except UnicodeDecodeError:
             print(f"Failed to decode with encoding: {encoding}")
         except Exception as e:
             print(f"An error occurred: {e}")
     raise Exception("All decoding attempts failed")
 
-def translate_file(input_file, output_file):
+def read_chunks(f, encoding, chunk_chars):
+    """Yield (chunk, bytes read so far) from a binary file, one block at a time.
+
+    Chunks hold at most `chunk_chars` characters and end on the best boundary
+    available: a paragraph, then a line, a sentence or a word.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    buffer = ''
+    position = 0
+    while True:
+        block = f.read(READ_BLOCK_SIZE)
+        position += len(block)
+        buffer += decoder.decode(block, final=not block)
+        while len(buffer) > chunk_chars:
+            cut = split_point(buffer, chunk_chars)
+            yield buffer[:cut], position
+            buffer = buffer[cut:]
+        if not block:
+            break
+    if buffer:
+        yield buffer, position
+
+def read_batches(f, encoding, chunk_chars):
+    """Group chunks into batches that fit in one request."""
+    batch = []
+    batch_chars = 0
+    batch_position = 0
+    for chunk, position in read_chunks(f, encoding, chunk_chars):
+        if batch and batch_chars + len(chunk) > BATCH_MAX_CHARS:
+            yield batch, batch_position
+            batch = []
+            batch_chars = 0
+        batch.append(chunk)
+        batch_chars += len(chunk)
+        batch_position = position
+    if batch:
+        yield batch, batch_position
+
+def translate_file(input_file, output_file, lang_tgt='auto', concurrency=8, chunk_chars=DEFAULT_CHUNK_CHARS):
     translator = google_translator(timeout=10)
-    
+    chunk_chars = max(1, min(chunk_chars, MAX_CHUNK_CHARS))
+
     # Detect file encoding
     encoding = detect_encoding(input_file)
     print(f"Detected encoding: {encoding}")
 
-    # Define a list of possible encodings
-    possible_encodings = [encoding, 'utf-8', 'gbk', 'latin1']
-
-    # Read the content from the input file in binary mode
-    binary_data = read_file_binary(input_file)
+    # Define a list of possible encodings. Only the start of the file is
+    # detected, so plain ASCII there is read as UTF-8, which extends it.
+    if encoding is not None and encoding.lower() == 'ascii':
+        encoding = 'utf-8'
+    possible_encodings = [e for e in [encoding, 'utf-8', 'gbk', 'latin1'] if e]
 
-    # Attempt to decode the binary data with different encodings
-    text = decode_text(binary_data, possible_encodings)
+    with open(input_file, 'rb') as f:
+        encoding = pick_encoding(f, possible_encodings)
 
-    # Show progress bar for translation
     print("Translating...")
-    translated_text = ""
+    # Batches are translated concurrently but written in order. At most
+    # 2 * concurrency batches are held in memory at any time.
+    with open(input_file, 'rb') as f, \
+            open(output_file, 'w', encoding='utf-8', newline='') as out, \
+            ThreadPoolExecutor(max_workers=concurrency) as executor, \
+            tqdm(total=os.path.getsize(input_file), desc="Progress", unit='B', unit_scale=True) as progress:
+        pending = deque()
 
-    # Simulate progress for large text
-    for _ in tqdm(range(1), desc="Progress"):
-        translated_text = translate_text(text, translator)
+        def write_next():
+            future, position = pending.popleft()
+            out.write(future.result())
+            out.flush()
+            progress.update(position - progress.n)
 
-    # Write the translated content to the output file
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(translated_text)
+        try:
+            for batch, position in read_batches(f, encoding, chunk_chars):
+                pending.append((executor.submit(translate_chunks, batch, translator, lang_tgt), position))
+                if len(pending) >= 2 * concurrency:
+                    write_next()
+            while pending:
+                write_next()
+        except BaseException:
+            for future, _ in pending:
+                future.cancel()
+            raise
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Translate all text inside a txt file using Google Translate.")
     parser.add_argument('input_file', type=str, help='Path to the input text file')
     parser.add_argument('output_file', type=str, help='Path to the output translated text file')
-    
+    parser.add_argument('-l', '--lang', type=str, default='auto', help='Destination language (default: auto)')
+    parser.add_argument('-c', '--concurrency', type=int, default=8,
+                        help='Maximum number of translation requests in flight (default: 8)')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_CHARS,
+                        help=f'Maximum characters per translated chunk, below 5000 (default: {DEFAULT_CHUNK_CHARS})')
+
     args = parser.parse_args()
-    
-    translate_file(args.input_file, args.output_file)
-    
+
+    translate_file(args.input_file, args.output_file, args.lang, max(1, args.concurrency), args.chunk_size)
+